@@ -0,0 +1,133 @@
+from typing import Optional
+
+import httpx
+from fastapi import Depends, Header, Request, Response
+from starlette.requests import HTTPConnection
+from redis import asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.services.admission import RateLimiter, bet_limiter, client_id
+from app.services.bets import BetService
+from app.services.bet_stream import BetStatusBroadcaster
+from app.services.events import EventService
+from app.services.idempotency import IdempotencyService
+from app.services.exposure import ExposureService
+from app.services.invalidation import EventChangeService
+from app.services.reports import ReportService
+from app.storage.group_commit import BetWriter
+from app.storage.postgres import AsyncSessionLocal
+from app.storage.redis import RedisStorage
+from app.storage.replicas import replica_router
+
+# Клиент с этой cookie недавно писал и читает с primary, чтобы видеть свои записи
+PRIMARY_PIN_COOKIE = "db_primary"
+
+
+async def get_session():
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+async def get_read_session(request: Request):
+    """Сессия для запросов только на чтение: реплика или primary после записи"""
+    if PRIMARY_PIN_COOKIE in request.cookies:
+        sessionmaker = AsyncSessionLocal
+    else:
+        sessionmaker = replica_router.sessionmaker()
+    async with sessionmaker() as session:
+        yield session
+
+
+def pin_to_primary(response: Response) -> None:
+    """Закрепление клиента за primary на DATABASE_PRIMARY_PIN_SECONDS после записи"""
+    if settings.DATABASE_PRIMARY_PIN_SECONDS > 0 and replica_router.replicas:
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE,
+            "1",
+            max_age=settings.DATABASE_PRIMARY_PIN_SECONDS,
+            httponly=True,
+            samesite="lax"
+        )
+
+
+def get_line_provider_client(request: Request) -> httpx.AsyncClient:
+    return request.app.state.line_provider_client
+
+
+def get_redis(request: Request) -> aioredis.Redis:
+    return request.app.state.redis
+
+
+def get_redis_storage(redis: aioredis.Redis = Depends(get_redis)):
+    return RedisStorage(redis)
+
+
+def get_event_service(
+        storage: RedisStorage = Depends(get_redis_storage),
+        client: httpx.AsyncClient = Depends(get_line_provider_client)
+):
+    return EventService(storage, client)
+
+
+def get_bet_writer(request: Request) -> Optional[BetWriter]:
+    return request.app.state.bet_writer
+
+
+def get_exposure_service(
+        storage: RedisStorage = Depends(get_redis_storage),
+        session: AsyncSession = Depends(get_session)
+):
+    return ExposureService(storage, session)
+
+
+def get_bet_service(
+        session: AsyncSession = Depends(get_session),
+        event_service: EventService = Depends(get_event_service),
+        writer: Optional[BetWriter] = Depends(get_bet_writer),
+        exposure: ExposureService = Depends(get_exposure_service)
+):
+    return BetService(session, event_service, writer, exposure)
+
+
+def get_bet_reader(session: AsyncSession = Depends(get_read_session)):
+    """Сервис ставок для чтения, без доступа к событиям и записи"""
+    return BetService(session, None)
+
+
+def get_report_service(session: AsyncSession = Depends(get_read_session)):
+    return ReportService(session)
+
+
+def get_idempotency_service(storage: RedisStorage = Depends(get_redis_storage)):
+    return IdempotencyService(storage)
+
+
+def get_event_change_service(
+        storage: RedisStorage = Depends(get_redis_storage),
+        event_service: EventService = Depends(get_event_service)
+):
+    return EventChangeService(storage, event_service)
+
+
+def get_bet_status_broadcaster(connection: HTTPConnection) -> BetStatusBroadcaster:
+    return connection.app.state.bet_status_broadcaster
+
+
+def get_client_id(request: Request, api_key: Optional[str] = Header(None, alias="X-API-Key")) -> str:
+    """Клиент запроса: хэш X-API-Key, иначе адрес"""
+    host = request.client.host if request.client is not None else None
+    return client_id(api_key, host)
+
+
+async def admit_bet(
+        client: str = Depends(get_client_id),
+        storage: RedisStorage = Depends(get_redis_storage)
+):
+    """Допуск запроса на создание ставок: лимит частоты клиента и число одновременных запросов"""
+    await RateLimiter(storage).check(client)
+    await bet_limiter.acquire()
+    try:
+        yield
+    finally:
+        bet_limiter.release()
@@ -0,0 +1,81 @@
+import asyncio
+import json
+from typing import List
+
+from fastapi import APIRouter, Depends, Query, WebSocket
+from fastapi.responses import StreamingResponse
+
+from app.api.dependencies import get_bet_status_broadcaster
+from app.core.config import settings
+from app.services.bet_stream import BetStatusBroadcaster
+
+router = APIRouter()
+
+
+@router.get("/bets/stream")
+async def stream_bet_statuses(
+        bet_id: List[int] = Query([]),
+        event_id: List[str] = Query([]),
+        broadcaster: BetStatusBroadcaster = Depends(get_bet_status_broadcaster)
+):
+    """Server-Sent Events о рассчитанных ставках
+
+    Фильтры bet_id и event_id можно повторять; без фильтров приходят все
+    расчёты. Событие overflow означает, что клиент отстал: подключение
+    закрывается, состояние нужно сверить через GET /bets.
+    """
+    async def events():
+        subscription = broadcaster.subscribe(bet_id, event_id)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), timeout=settings.BET_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    yield "event: overflow\ndata: {}\n\n"
+                    return
+                yield f"event: settled\ndata: {json.dumps(message)}\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.websocket("/bets/ws")
+async def bet_statuses_websocket(
+        websocket: WebSocket,
+        bet_id: List[int] = Query([]),
+        event_id: List[str] = Query([]),
+        broadcaster: BetStatusBroadcaster = Depends(get_bet_status_broadcaster)
+):
+    """Рассчитанные ставки через WebSocket, фильтры как у /bets/stream"""
+    await websocket.accept()
+    subscription = broadcaster.subscribe(bet_id, event_id)
+    # Чтение нужно только для того, чтобы заметить отключение клиента
+    disconnected = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        while True:
+            message = asyncio.ensure_future(subscription.get())
+            await asyncio.wait({message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                message.cancel()
+                return
+            if message.result() is None:
+                # 1013: попробуйте позже — клиент отстал и должен переподключиться
+                await websocket.close(code=1013)
+                return
+            await websocket.send_json(message.result())
+    finally:
+        disconnected.cancel()
+        broadcaster.unsubscribe(subscription)
+
+
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
@@ -1,44 +1,60 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+from datetime import datetime
+from typing import Optional
 
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Response
+from fastapi.responses import ORJSONResponse
+
+from app.api.dependencies import (
+    admit_bet,
+    get_bet_reader,
+    get_bet_service,
+    get_client_id,
+    get_idempotency_service,
+    pin_to_primary
+)
 from app.services.bets import BetService
-from app.services.events import EventService
+from app.services.idempotency import IdempotencyService
 from app.schemas.bets import (
     CreateBetRequest,
+    CreateBetsBatchRequest,
     BetResponse,
+    BatchBetResult,
+    BetsBatchResponse,
     BetsListResponse
 )
-from app.storage.postgres import AsyncSessionLocal
-from app.storage.redis import RedisStorage
+from app.models.bets import BetRecord, BetStatus
 from app.models.common import StatusEnum
+from app.core.config import settings
 from app.core.exceptions import (
+    BetNotFoundError,
     BetValidationError,
     EventNotFoundError,
-    DeadlinePassedError
+    DeadlinePassedError,
+    ExposureLimitError,
+    IdempotencyConflictError,
+    IdempotencyKeyMismatchError,
+    LineProviderError
 )
 
 router = APIRouter()
 
 
-async def get_session():
-    async with AsyncSessionLocal() as session:
-        yield session
-
-
-def get_bet_service(
-        session: AsyncSession = Depends(get_session),
-        event_service: EventService = Depends(lambda: EventService(RedisStorage()))
-):
-    return BetService(session, event_service)
-
-
-@router.post("/bet", response_model=BetResponse)
+@router.post("/bet", response_model=BetResponse, dependencies=[Depends(admit_bet)])
 async def create_bet(
         bet_request: CreateBetRequest,
-        service: BetService = Depends(get_bet_service)
+        response: Response,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+        client: str = Depends(get_client_id),
+        service: BetService = Depends(get_bet_service),
+        idempotency: IdempotencyService = Depends(get_idempotency_service)
 ):
-    """Создание новой ставки"""
-    try:
+    """Создание новой ставки
+
+    С заголовком Idempotency-Key повторный запрос того же клиента (X-API-Key,
+    иначе адрес) получает первый ответ без повторного создания ставки.
+    """
+    async def place_bet() -> dict:
         bet = await service.create_bet(
             bet_request.event_id,
             bet_request.amount
@@ -47,24 +63,111 @@ async def create_bet(
             status=StatusEnum.SUCCESS,
             message="Ставка успешно создана",
             data=bet
+        ).model_dump(mode="json")
+
+    try:
+        if idempotency_key is None:
+            result = await place_bet()
+        else:
+            fingerprint = hashlib.sha256(bet_request.model_dump_json().encode()).hexdigest()
+            result = await idempotency.execute(idempotency_key, fingerprint, place_bet, client)
+        pin_to_primary(response)
+        return result
+    except (
+        BetValidationError,
+        EventNotFoundError,
+        DeadlinePassedError,
+        ExposureLimitError,
+        IdempotencyConflictError,
+        IdempotencyKeyMismatchError,
+        LineProviderError
+    ) as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/bets/batch", response_model=BetsBatchResponse, dependencies=[Depends(admit_bet)])
+async def create_bets_batch(
+        batch_request: CreateBetsBatchRequest,
+        response: Response,
+        service: BetService = Depends(get_bet_service)
+):
+    """Пакетное создание ставок с результатом по каждой позиции"""
+    try:
+        outcomes = await service.create_bets(
+            [(bet.event_id, bet.amount) for bet in batch_request.bets]
         )
-    except (BetValidationError, EventNotFoundError, DeadlinePassedError) as e:
+    except LineProviderError as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    results = [
+        BatchBetResult(index=index, status=StatusEnum.SUCCESS, bet=outcome)
+        if isinstance(outcome, BetRecord)
+        else BatchBetResult(index=index, status=StatusEnum.ERROR, error=outcome.detail)
+        for index, outcome in enumerate(outcomes)
+    ]
+    created = sum(result.status == StatusEnum.SUCCESS for result in results)
+    if created:
+        pin_to_primary(response)
+    return BetsBatchResponse(
+        status=StatusEnum.SUCCESS,
+        message=f"Создано ставок: {created} из {len(results)}",
+        data={"results": results, "created": created, "failed": len(results) - created}
+    )
+
 
 @router.get("/bets", response_model=BetsListResponse)
 async def get_bets(
-        service: BetService = Depends(get_bet_service)
+        limit: int = Query(settings.BETS_PAGE_DEFAULT_LIMIT, ge=1, le=settings.BETS_PAGE_MAX_LIMIT),
+        cursor: Optional[str] = None,
+        event_id: Optional[str] = None,
+        status: Optional[BetStatus] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        service: BetService = Depends(get_bet_reader)
 ):
-    """Получение списка всех ставок"""
+    """Получение страницы ставок с фильтрами
+
+    Ставки уже проверены при записи, поэтому ответ сериализуется orjson
+    напрямую, минуя повторную валидацию через response_model.
+    """
     try:
-        bets = await service.get_bets()
-        return BetsListResponse(
-            status=StatusEnum.SUCCESS,
-            message="Список ставок получен",
-            data={"bets": bets}
+        bets, next_cursor = await service.get_bets(
+            limit=limit,
+            cursor=cursor,
+            event_id=event_id,
+            status=status,
+            created_from=created_from,
+            created_to=created_to
         )
+        return ORJSONResponse({
+            "status": StatusEnum.SUCCESS,
+            "message": "Список ставок получен",
+            "data": {"bets": bets, "next_cursor": next_cursor}
+        })
+    except BetValidationError as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/bets/{bet_id}", response_model=BetResponse)
+async def get_bet(
+        bet_id: int,
+        service: BetService = Depends(get_bet_reader)
+):
+    """Получение ставки по ID, в том числе перенесённой в архив"""
+    try:
+        bet = await service.get_bet(bet_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if bet is None:
+        raise BetNotFoundError(bet_id)
+    return BetResponse(
+        status=StatusEnum.SUCCESS,
+        message="Ставка получена",
+        data=bet
+    )
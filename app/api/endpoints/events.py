@@ -1,24 +1,33 @@
-from fastapi import APIRouter, HTTPException, Depends
+import hmac
+from typing import List, Optional
 
+from fastapi import APIRouter, HTTPException, Depends, Header
+
+from app.api.dependencies import get_event_service, get_event_change_service, get_exposure_service
+from app.core.config import settings
+from app.core.exceptions import InvalidWebhookTokenError
+from app.models.events import EventChange
 from app.services.events import EventService
-from app.schemas.events import EventsListResponse
-from app.storage.redis import RedisStorage
+from app.services.exposure import ExposureService
+from app.services.invalidation import EventChangeService
+from app.schemas.events import EventsListResponse, CacheStatsResponse, EventExposureResponse
+from app.storage.memory import event_cache, event_cache_stats
 from app.models.common import StatusEnum
 
 router = APIRouter()
 
 
-def get_event_service():
-    return EventService(RedisStorage())
-
-
 @router.get("/events", response_model=EventsListResponse)
 async def get_events(
+        open_only: bool = False,
         service: EventService = Depends(get_event_service)
 ):
-    """Получение списка доступных событий"""
+    """Получение списка доступных событий
+
+    С open_only=true — только события с ненаступившим дедлайном, от ближайшего.
+    """
     try:
-        events = await service.get_events()
+        events = await service.get_open_events() if open_only else await service.get_events()
         return EventsListResponse(
             status=StatusEnum.SUCCESS,
             message="События успешно получены",
@@ -26,3 +35,56 @@ async def get_events(
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/events/cache/stats", response_model=CacheStatsResponse)
+async def get_events_cache_stats():
+    """Счётчики попаданий и промахов кэша событий"""
+    return CacheStatsResponse(
+        status=StatusEnum.SUCCESS,
+        message="Статистика кэша событий",
+        data={**event_cache_stats.as_dict(), "local_size": len(event_cache)}
+    )
+
+
+@router.post("/events/changes", response_model=EventsListResponse)
+async def push_event_changes(
+        changes: List[EventChange],
+        webhook_token: Optional[str] = Header(None, alias="X-Webhook-Token"),
+        service: EventChangeService = Depends(get_event_change_service)
+):
+    """Приём изменений событий от line provider и сброс кэшей во всех воркерах
+
+    Изменения меняют коэффициенты принимаемых ставок и запускают расчёт,
+    поэтому без заданного LINE_PROVIDER_WEBHOOK_TOKEN приём закрыт.
+    """
+    expected_token = settings.LINE_PROVIDER_WEBHOOK_TOKEN or ""
+    # Сравнение выполняется всегда, чтобы время ответа не зависело от настройки
+    token_valid = hmac.compare_digest((webhook_token or "").encode(), expected_token.encode())
+    if not expected_token or not token_valid:
+        raise InvalidWebhookTokenError()
+
+    # Токен проверен: исходы от line provider отправляются на расчёт без повторной сверки
+    events = await service.apply_changes(changes, trusted=True)
+    return EventsListResponse(
+        status=StatusEnum.SUCCESS,
+        message="Изменения событий применены",
+        data={"events": events}
+    )
+
+
+@router.get("/events/{event_id}/exposure", response_model=EventExposureResponse)
+async def get_event_exposure(
+        event_id: str,
+        service: ExposureService = Depends(get_exposure_service)
+):
+    """Текущий риск по событию: суммы и возможные выплаты по ожидающим ставкам"""
+    try:
+        exposure = await service.get_exposure(event_id)
+        return EventExposureResponse(
+            status=StatusEnum.SUCCESS,
+            message="Риск по событию получен",
+            data=exposure
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends
+
+from app.api.dependencies import get_report_service
+from app.core.exceptions import ReportRangeError
+from app.models.common import StatusEnum
+from app.models.reports import ReportGranularity
+from app.schemas.reports import BetsReportResponse
+from app.services.reports import ReportService
+
+router = APIRouter()
+
+# Период по умолчанию, если начало не передано
+DEFAULT_PERIODS = {
+    ReportGranularity.HOUR: timedelta(days=1),
+    ReportGranularity.DAY: timedelta(days=30),
+}
+
+
+async def _build_report(
+        service: ReportService,
+        granularity: ReportGranularity,
+        created_from: Optional[datetime],
+        created_to: Optional[datetime],
+        event_id: Optional[str]
+) -> BetsReportResponse:
+    created_to = created_to or datetime.now()
+    created_from = created_from or created_to - DEFAULT_PERIODS[granularity]
+    try:
+        report = await service.get_report(granularity, created_from, created_to, event_id)
+        return BetsReportResponse(
+            status=StatusEnum.SUCCESS,
+            message="Отчёт по ставкам сформирован",
+            data=report
+        )
+    except ReportRangeError as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/reports/summary", response_model=BetsReportResponse)
+async def get_summary_report(
+        granularity: ReportGranularity = ReportGranularity.DAY,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        event_id: Optional[str] = None,
+        service: ReportService = Depends(get_report_service)
+):
+    """Оборот, выплаты и количество ставок по часам или дням
+
+    Строится из почасовых агрегатов и отстаёт от ставок не больше чем на
+    ROLLUP_INTERVAL.
+    """
+    return await _build_report(service, granularity, created_from, created_to, event_id)
+
+
+@router.get("/reports/events/{event_id}", response_model=BetsReportResponse)
+async def get_event_report(
+        event_id: str,
+        granularity: ReportGranularity = ReportGranularity.HOUR,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        service: ReportService = Depends(get_report_service)
+):
+    """Отчёт по ставкам на одно событие"""
+    return await _build_report(service, granularity, created_from, created_to, event_id)
@@ -1,6 +1,9 @@
 from fastapi import APIRouter
-from .endpoints import events, bets
+from .endpoints import events, bets, bet_stream, reports
 
 router = APIRouter()
 router.include_router(events.router, tags=["events"])
+# Поток расчётов подключается раньше ставок, чтобы /bets/stream не перекрывался маршрутами /bets/{...}
+router.include_router(bet_stream.router, tags=["bets"])
 router.include_router(bets.router, tags=["bets"])
+router.include_router(reports.router, tags=["reports"])
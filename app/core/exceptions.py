@@ -14,6 +14,14 @@ class EventNotFoundError(HTTPException):
         )
 
 
+class BetNotFoundError(HTTPException):
+    def __init__(self, bet_id: int):
+        super().__init__(
+            status_code=404,
+            detail=f"Ставка с ID {bet_id} не найдена"
+        )
+
+
 class DeadlinePassedError(HTTPException):
     def __init__(self, event_id: str):
         super().__init__(
@@ -28,3 +36,55 @@ class LineProviderError(HTTPException):
             status_code=502,
             detail=f"Ошибка при обращении к Line Provider: {detail}"
         )
+
+
+class IdempotencyConflictError(HTTPException):
+    def __init__(self, key: str):
+        super().__init__(
+            status_code=409,
+            detail=f"Запрос с ключом идемпотентности {key} ещё обрабатывается"
+        )
+
+
+class IdempotencyKeyMismatchError(HTTPException):
+    def __init__(self, key: str):
+        super().__init__(
+            status_code=422,
+            detail=f"Ключ идемпотентности {key} уже использован с другим телом запроса"
+        )
+
+
+class InvalidWebhookTokenError(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=403, detail="Неверный токен webhook")
+
+
+class ExposureLimitError(HTTPException):
+    def __init__(self, event_id: str):
+        super().__init__(
+            status_code=409,
+            detail=f"Превышен лимит риска по событию {event_id}"
+        )
+
+
+class RateLimitExceededError(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=429,
+            detail="Слишком много запросов, повторите позже",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class ServiceOverloadedError(HTTPException):
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=503,
+            detail="Сервис перегружен, повторите позже",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class ReportRangeError(HTTPException):
+    def __init__(self, detail: str):
+        super().__init__(status_code=400, detail=detail)
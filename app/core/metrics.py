@@ -0,0 +1,229 @@
+"""Метрики в формате Prometheus
+
+Значения меняются только из потока event loop, поэтому счётчики — обычные
+числа без блокировок. Гистограмма хранит счётчики по корзинам, кумулятивные
+суммы считаются только при выгрузке /metrics.
+
+Реестр свой в каждом процессе. При нескольких процессах uvicorn каждый из них
+публикует свои метрики в Redis вместе с отметкой воркера, а /metrics склеивает
+семейства всех живых воркеров с меткой worker (см. merge_families).
+"""
+import asyncio
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+# Семейство метрик в переносимом виде: [имя, описание, тип, строки значений]
+Family = List
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _with_label(line: str, label: str) -> str:
+    """Добавление метки первой в строку значения `name{labels} value`"""
+    brace, space = line.find("{"), line.find(" ")
+    if brace != -1 and brace < space:
+        return f"{line[:brace + 1]}{label},{line[brace + 1:]}"
+    return f"{line[:space]}{{{label}}}{line[space:]}"
+
+
+class Counter:
+    __slots__ = ("name", "help", "labelnames", "_values")
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, labels: Labels = ()) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    __slots__ = ()
+    type = "gauge"
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self._values[labels] = value
+
+
+class Histogram:
+    __slots__ = ("name", "help", "labelnames", "buckets", "_series")
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # На каждый набор меток: [счётчики корзин..., +Inf, сумма]
+        self._series: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 2)
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> Iterable[str]:
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            label_str = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_str} {series[-1]}"
+            yield f"{self.name}_count{label_str} {cumulative}"
+
+
+class CallbackMetric:
+    """Метрика, значения которой вычисляются в момент выгрузки"""
+    __slots__ = ("name", "help", "type", "labelnames", "callback")
+
+    def __init__(
+            self,
+            name: str,
+            help: str,
+            callback: Callable[[], Iterable[Tuple[Labels, float]]],
+            type: str = "gauge",
+            labelnames: Sequence[str] = ()
+    ):
+        self.name = name
+        self.help = help
+        self.type = type
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def collect(self) -> Iterable[str]:
+        for labels, value in self.callback():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return render_families(self.families())
+
+    def families(self, worker: str = "") -> List[Family]:
+        """Текущие значения по семействам; worker добавляется меткой к каждой строке"""
+        label = f'worker="{_escape(worker)}"' if worker else ""
+        families = []
+        for metric in self._metrics:
+            lines = list(metric.collect())
+            if label:
+                lines = [_with_label(line, label) for line in lines]
+            families.append([metric.name, metric.help, metric.type, lines])
+        return families
+
+
+def render_families(families: Iterable[Family]) -> str:
+    lines = []
+    for name, help, type, values in families:
+        lines.append(f"# HELP {name} {help}")
+        lines.append(f"# TYPE {name} {type}")
+        lines.extend(values)
+    return "\n".join(lines) + "\n"
+
+
+def merge_families(snapshots: Iterable[List[Family]]) -> List[Family]:
+    """Склейка семейств нескольких процессов
+
+    Формат Prometheus требует, чтобы строки одного семейства шли подряд под
+    единственными HELP и TYPE, поэтому строки собираются по имени семейства.
+    """
+    merged: Dict[str, Family] = {}
+    for families in snapshots:
+        for name, help, type, values in families:
+            family = merged.get(name)
+            if family is None:
+                merged[name] = [name, help, type, list(values)]
+            else:
+                family[3].extend(values)
+    return list(merged.values())
+
+
+async def start_metrics_server(port: int, host: str = "0.0.0.0") -> asyncio.AbstractServer:
+    """Минимальный HTTP-сервер с /metrics для процессов без FastAPI (воркеры)"""
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = registry.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запросов",
+    ("method", "route", "status")
+))
+line_provider_request_duration = registry.register(Histogram(
+    "line_provider_request_duration_seconds",
+    "Длительность запросов к line provider",
+    ("endpoint",)
+))
+line_provider_errors = registry.register(Counter(
+    "line_provider_errors_total",
+    "Ошибки запросов к line provider",
+    ("endpoint", "reason")
+))
+db_pool_checkout_wait = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Ожидание свободного соединения в пуле SQLAlchemy"
+))
+settlement_batch_size = registry.register(Histogram(
+    "settlement_batch_size",
+    "Число ставок в одной пачке расчёта",
+    buckets=(1, 10, 100, 500, 1000, 2500, 5000, 10000, 50000)
+))
+settlement_batch_duration = registry.register(Histogram(
+    "settlement_batch_duration_seconds",
+    "Длительность расчёта одной пачки ставок"
+))
+bet_stream_connections = registry.register(Gauge(
+    "bet_stream_connections",
+    "Открытые подключения /bets/stream и /bets/ws"
+))
+admission_rejections = registry.register(Counter(
+    "admission_rejections_total",
+    "Запросы на ставки, отклонённые до обработки",
+    ("reason",)
+))
@@ -1,13 +1,91 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api.routes import router
+from app.api.dependencies import get_redis_storage
+from app.api.middleware import MetricsMiddleware
+from app.core.metrics import merge_families, registry, render_families
 from app.storage.postgres import engine, Base
+from app.storage.line_provider import create_line_provider_client
+from app.storage.redis import RedisStorage, create_redis_pool
+from app.storage.partitions import ensure_bets_partitions
+from app.storage.replicas import replica_router
+from app.storage.group_commit import BetWriter
+from app.services.event_poller import EventPoller
+from app.services.invalidation import EventChangeListener
+from app.services.heartbeat import WorkerHeartbeat, worker_id
+from app.services.partitions import PartitionMaintainer
+from app.services.bet_stream import BetStatusBroadcaster
+from app.services.warmup import Warmup
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Один пул соединений к line-provider на всё время жизни приложения
+    app.state.line_provider_client = create_line_provider_client()
+    app.state.redis = create_redis_pool()
+    app.state.partition_maintainer = None
+    if settings.BETS_PARTITIONING:
+        await ensure_bets_partitions()
+        app.state.partition_maintainer = PartitionMaintainer(RedisStorage(app.state.redis))
+        await app.state.partition_maintainer.start()
+    await replica_router.start()
+
+    app.state.bet_writer = None
+    if settings.BET_GROUP_COMMIT_ENABLED:
+        app.state.bet_writer = BetWriter()
+        await app.state.bet_writer.start()
+
+    app.state.event_change_listener = EventChangeListener(app.state.redis)
+    await app.state.event_change_listener.start()
+
+    app.state.bet_status_broadcaster = BetStatusBroadcaster(app.state.redis)
+    await app.state.bet_status_broadcaster.start()
+
+    app.state.event_poller = None
+    if settings.EVENT_POLLER_ENABLED:
+        app.state.event_poller = EventPoller(RedisStorage(app.state.redis), app.state.line_provider_client)
+        await app.state.event_poller.start()
+
+    app.state.heartbeat = WorkerHeartbeat(
+        RedisStorage(app.state.redis),
+        app.state.event_change_listener,
+        app.state.event_poller
+    )
+    await app.state.heartbeat.start()
+
+    # Прогрев идёт в фоне: сервер уже принимает запросы, но /ready отвечает 503
+    app.state.warmup = Warmup(app.state.redis, app.state.line_provider_client)
+    await app.state.warmup.start()
+    try:
+        yield
+    finally:
+        await app.state.warmup.stop()
+        await app.state.heartbeat.stop()
+        if app.state.event_poller is not None:
+            await app.state.event_poller.stop()
+        await app.state.bet_status_broadcaster.stop()
+        await app.state.event_change_listener.stop()
+        if app.state.bet_writer is not None:
+            await app.state.bet_writer.stop()
+        await replica_router.stop()
+        if app.state.partition_maintainer is not None:
+            await app.state.partition_maintainer.stop()
+        await app.state.line_provider_client.aclose()
+        await app.state.redis.aclose()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -18,6 +96,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 # Роуты
 app.include_router(router)
@@ -34,6 +113,38 @@ app.include_router(router)
 async def health_check():
     return {"status": "healthy"}
 
+
+@app.get("/ready")
+async def readiness(request: Request):
+    """Готовность принимать трафик: прогрев завершён, PostgreSQL и Redis отвечают"""
+    report = await request.app.state.warmup.probe()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/health/workers")
+async def workers_health(storage: RedisStorage = Depends(get_redis_storage)):
+    """Воркеры API, отметившиеся в Redis за последние WORKER_HEARTBEAT_INTERVAL * 3 секунд"""
+    workers = await storage.get_heartbeats()
+    return {"status": "healthy", "workers": workers, "count": len(workers)}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(storage: RedisStorage = Depends(get_redis_storage)):
+    """Метрики всех процессов API с меткой worker
+
+    Запрос попадает в случайный процесс uvicorn, поэтому свои значения он берёт
+    из памяти, а значения остальных — из снимков, опубликованных с отметкой
+    воркера (отстают не больше чем на WORKER_HEARTBEAT_INTERVAL).
+    """
+    current = worker_id()
+    snapshots = [registry.families(current)]
+    try:
+        snapshots.extend(await storage.get_worker_metrics(exclude=current))
+    except Exception:
+        logger.warning("Не удалось получить метрики остальных воркеров из Redis")
+    return PlainTextResponse(render_families(merge_families(snapshots)), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
+    # Несколько процессов делят один сокет; приложению нужен импорт по строке
+    uvicorn.run("app.main:app", host=settings.HOST, port=settings.PORT, workers=settings.WORKERS)
\ No newline at end of file
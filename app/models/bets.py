@@ -1,7 +1,9 @@
+from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+from typing import Any, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class BetStatus(str, Enum):
@@ -11,9 +13,32 @@ class BetStatus(str, Enum):
 
 
 class Bet(BaseModel):
+    # Позволяет отдавать BetRecord в схемах ответов без ручного преобразования
+    model_config = ConfigDict(from_attributes=True)
+
     id: int | None = None
     event_id: str
     amount: float = Field(gt=0)
     status: BetStatus = BetStatus.PENDING
     created_at: datetime = Field(default_factory=datetime.now)
     coefficient: float | None = None  # Коэффициент на момент ставки
+
+
+@dataclass(slots=True)
+class BetRecord:
+    """Ставка, прочитанная из БД
+
+    Данные уже проверены при записи, поэтому запись собирается без валидации
+    pydantic и сериализуется orjson напрямую.
+    """
+    id: int
+    event_id: str
+    amount: float
+    status: BetStatus
+    created_at: datetime
+    coefficient: Optional[float]
+
+    @classmethod
+    def from_row(cls, row: Any) -> "BetRecord":
+        """Строка с колонками BET_RETURNING или объект BetDB"""
+        return cls(row.id, row.event_id, row.amount, row.status, row.created_at, row.coefficient)
@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -14,3 +15,25 @@ class Event(BaseModel):
     coefficient: float
     deadline: str
     status: EventStatus = EventStatus.NEW
+
+
+class EventChange(BaseModel):
+    """Изменение события, присланное line provider"""
+    event_id: str
+    coefficient: Optional[float] = None
+    deadline: Optional[str] = None
+    status: Optional[EventStatus] = None
+
+    def apply(self, event: Event) -> Event:
+        return event.model_copy(update=self.model_dump(exclude_none=True, exclude={"event_id"}))
+
+
+class EventExposure(BaseModel):
+    event_id: str
+    pending_amount: float = 0.0  # Сумма ожидающих ставок
+    pending_liability: float = 0.0  # Возможная выплата по ожидающим ставкам
+    pending_bets: int = 0
+    turnover: float = 0.0  # Сумма всех принятых ставок
+    bets: int = 0
+    payout: float = 0.0  # Выплаты по выигравшим ставкам
+    limit: Optional[float] = None  # Лимит на pending_liability
@@ -0,0 +1,28 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ReportGranularity(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+
+class ReportBucket(BaseModel):
+    bucket: Optional[datetime] = None  # Начало интервала; у итога не задано
+    bets: int = 0
+    amount: float = 0.0  # Оборот
+    payout: float = 0.0  # Выплаты по выигравшим ставкам
+    pending_bets: int = 0
+    won_bets: int = 0
+    lost_bets: int = 0
+    pending_amount: float = 0.0  # Сумма ожидающих ставок
+    settled_amount: float = 0.0  # Сумма рассчитанных ставок
+
+class BetsReport(BaseModel):
+    granularity: ReportGranularity
+    event_id: Optional[str] = None  # None - по всем событиям
+    buckets: List[ReportBucket]
+    total: ReportBucket
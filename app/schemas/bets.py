@@ -1,8 +1,10 @@
-from typing import List
+from typing import List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from app.core.config import settings
 from app.models.bets import Bet
+from app.models.common import StatusEnum
 from app.schemas.responses import DataResponse
 
 
@@ -11,12 +13,34 @@ class CreateBetRequest(BaseModel):
     amount: float
 
 
+class CreateBetsBatchRequest(BaseModel):
+    bets: List[CreateBetRequest] = Field(min_length=1, max_length=settings.BETS_BATCH_MAX_SIZE)
+
+
 class BetResponse(DataResponse[Bet]):
     pass
 
 
+class BatchBetResult(BaseModel):
+    index: int  # Позиция ставки в запросе
+    status: StatusEnum
+    bet: Optional[Bet] = None
+    error: Optional[str] = None
+
+
+class BetsBatch(BaseModel):
+    results: List[BatchBetResult]
+    created: int
+    failed: int
+
+
+class BetsBatchResponse(DataResponse[BetsBatch]):
+    pass
+
+
 class BetsList(BaseModel):
     bets: List[Bet]
+    next_cursor: Optional[str] = None  # Курсор следующей страницы
 
 
 class BetsListResponse(DataResponse[BetsList]):
@@ -1,8 +1,8 @@
-from typing import List
+from typing import Dict, List
 
 from pydantic import BaseModel
 
-from app.models.events import Event
+from app.models.events import Event, EventExposure
 from app.schemas.responses import DataResponse
 
 
@@ -12,3 +12,11 @@ class EventsList(BaseModel):
 
 class EventsListResponse(DataResponse[EventsList]):
     pass
+
+
+class CacheStatsResponse(DataResponse[Dict[str, int]]):
+    pass
+
+
+class EventExposureResponse(DataResponse[EventExposure]):
+    pass
@@ -0,0 +1,6 @@
+from app.models.reports import BetsReport
+from app.schemas.responses import DataResponse
+
+
+class BetsReportResponse(DataResponse[BetsReport]):
+    pass
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import logging
+import math
+from collections import deque
+from typing import Deque, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.exceptions import RateLimitExceededError, ServiceOverloadedError
+from app.core.metrics import CallbackMetric, admission_rejections, registry
+from app.storage.redis import RedisStorage
+
+logger = logging.getLogger(__name__)
+
+# Маркерное ведро клиента: пополнение по времени Redis, списание cost маркеров.
+# ARGV - скорость (маркеров в секунду), ёмкость и стоимость запроса.
+# Возвращает {1, 0}, если запрос допущен, или {0, мс до появления нужных маркеров}.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local result = {1, 0}
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    result = {0, math.ceil((cost - tokens) * 1000 / rate)}
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return result
+"""
+
+
+class RateLimiter:
+    """Ограничение частоты запросов клиента маркерным ведром в Redis
+
+    Ведро общее для всех воркеров. При недоступности Redis запросы
+    пропускаются: ограничитель не должен сам становиться причиной отказа.
+    """
+
+    def __init__(
+            self,
+            storage: RedisStorage,
+            rate: float = settings.RATE_LIMIT_RATE,
+            burst: int = settings.RATE_LIMIT_BURST
+    ):
+        self.storage = storage
+        self.rate = rate
+        self.burst = burst
+        self.RATE_LIMIT_PREFIX = "ratelimit:"
+        self._script = storage.redis.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def check(self, client_id: str, cost: int = 1) -> None:
+        """Списание маркеров клиента, RateLimitExceededError, если их не хватает"""
+        if self.rate <= 0:
+            return
+        try:
+            allowed, retry_after_ms = await self._script(
+                keys=[f"{self.RATE_LIMIT_PREFIX}{client_id}"],
+                args=[self.rate, self.burst, cost]
+            )
+        except RedisError:
+            logger.warning("Ограничитель частоты недоступен, запрос пропущен", exc_info=True)
+            return
+        if not allowed:
+            admission_rejections.inc(labels=("rate_limit",))
+            raise RateLimitExceededError(max(1, math.ceil(retry_after_ms / 1000)))
+
+
+class ConcurrencyLimiter:
+    """Ограничение числа одновременно обрабатываемых запросов процесса
+
+    Запрос ждёт свободного места не дольше timeout секунд и получает 503,
+    чтобы очередь не росла внутри процесса, пока все ждут пул БД.
+
+    Освободившееся место передаётся первому ожидающему напрямую. Если срок
+    ожидания истёк или запрос отменён в момент передачи, место отдаётся
+    следующему: с asyncio.wait_for вокруг Semaphore.acquire на Python 3.10
+    оно в такой гонке терялось бы навсегда.
+    """
+
+    def __init__(self, limit: int, timeout: float):
+        self.limit = limit
+        self.timeout = timeout
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.timeout)
+        except BaseException as e:
+            if waiter.done() and not waiter.cancelled():
+                # Место уже передано этому запросу: отдаём его дальше
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                admission_rejections.inc(labels=("overload",))
+                raise ServiceOverloadedError(max(1, math.ceil(self.timeout)))
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Место переходит ожидающему, in_flight не меняется
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def client_id(api_key: Optional[str], host: Optional[str]) -> str:
+    """Ключ клиента для ограничителя; сами API-ключи в Redis не попадают"""
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+    return f"ip:{host or 'unknown'}"
+
+
+bet_limiter = ConcurrencyLimiter(
+    settings.BET_MAX_IN_FLIGHT or settings.DATABASE_POOL_SIZE + settings.DATABASE_MAX_OVERFLOW,
+    settings.BET_QUEUE_TIMEOUT
+)
+
+registry.register(CallbackMetric(
+    "bets_in_flight",
+    "Запросы на ставки, обрабатываемые сейчас",
+    lambda: (((), bet_limiter.in_flight),)
+))
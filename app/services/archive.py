@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import settings
+from app.models.bets import BetStatus
+from app.storage.postgres import AsyncSessionLocal, BetArchiveDB, BetDB
+
+# Колонки, которые переносятся из bets в bets_archive
+ARCHIVED_COLUMNS = ("id", "event_id", "amount", "status", "created_at", "coefficient")
+SETTLED_STATUSES = (BetStatus.WON, BetStatus.LOST)
+
+
+class BetArchiver:
+    """Перенос рассчитанных ставок из bets в bets_archive
+
+    Каждая пачка переносится одним оператором DELETE ... RETURNING внутри
+    INSERT в отдельной транзакции: ставка оказывается ровно в одной из таблиц,
+    а прерванный перенос продолжается со следующей пачки без отдельной
+    отметки прогресса. Строки выбираются с SKIP LOCKED, поэтому перенос
+    не ждёт блокировок расчёта и может идти в нескольких процессах.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker = AsyncSessionLocal,
+            batch_size: int = settings.ARCHIVE_BATCH_SIZE,
+            pause: float = settings.ARCHIVE_BATCH_PAUSE
+    ):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.pause = pause
+
+    async def archive(self, older_than: timedelta, max_batches: Optional[int] = None) -> int:
+        """Перенос ставок, созданных раньше now - older_than; возвращает число перенесённых"""
+        cutoff = datetime.now() - older_than
+        archived = batches = 0
+        while max_batches is None or batches < max_batches:
+            moved = await self.archive_batch(cutoff)
+            archived += moved
+            batches += 1
+            if moved < self.batch_size:
+                break
+            await asyncio.sleep(self.pause)
+        return archived
+
+    async def archive_batch(self, cutoff: datetime) -> int:
+        batch = (
+            select(BetDB.id, BetDB.created_at)
+            .where(BetDB.status.in_(SETTLED_STATUSES), BetDB.created_at < cutoff)
+            .order_by(BetDB.created_at, BetDB.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        # (id, created_at) совпадает с первичным ключом партиционированной таблицы
+        moved = (
+            delete(BetDB)
+            .where(tuple_(BetDB.id, BetDB.created_at).in_(batch))
+            .returning(*(getattr(BetDB, column) for column in ARCHIVED_COLUMNS))
+            .cte("moved")
+        )
+        # Ставка, уже лежащая в архиве (повторный перенос после восстановления), не дублируется
+        archived = (
+            insert(BetArchiveDB)
+            .from_select(ARCHIVED_COLUMNS, select(moved))
+            .on_conflict_do_nothing(index_elements=["id"])
+            .cte("archived")
+        )
+        query = select(func.count()).select_from(moved).add_cte(archived)
+        async with self.session_factory() as session:
+            moved_count = (await session.execute(query)).scalar_one()
+            await session.commit()
+        return moved_count
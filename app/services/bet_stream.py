@@ -0,0 +1,145 @@
+import asyncio
+import json
+import logging
+from typing import Dict, FrozenSet, Optional, Set
+
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+from app.core.metrics import bet_stream_connections
+from app.storage.redis import RedisStorage
+
+logger = logging.getLogger(__name__)
+
+
+class BetStatusSubscription:
+    """Подключение клиента к потоку расчётов с собственным ограниченным буфером
+
+    Если клиент не успевает читать и буфер заполнен, подписка закрывается:
+    клиент переподключается и сверяет состояние через GET /bets.
+    """
+    __slots__ = ("bet_ids", "event_ids", "queue", "overflowed")
+
+    def __init__(self, bet_ids: FrozenSet[int], event_ids: FrozenSet[str], maxsize: int):
+        self.bet_ids = bet_ids
+        self.event_ids = event_ids
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.overflowed = False
+
+    def push(self, message: dict) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            # Пустое сообщение будит читателя, чтобы он закрыл подключение
+            self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+    async def get(self) -> Optional[dict]:
+        """Следующее сообщение или None, если подписка переполнилась"""
+        return await self.queue.get()
+
+
+class BetStatusBroadcaster:
+    """Одна подписка воркера на канал расчётов, раздача по подключениям
+
+    Подключения индексируются по ставкам и событиям, поэтому пачка из
+    тысяч ставок разбирается за один проход независимо от числа клиентов.
+    """
+
+    def __init__(self, redis: aioredis.Redis, queue_size: int = settings.BET_STREAM_QUEUE_SIZE):
+        self.storage = RedisStorage(redis)
+        self.queue_size = queue_size
+        self._by_bet: Dict[int, Set[BetStatusSubscription]] = {}
+        self._by_event: Dict[str, Set[BetStatusSubscription]] = {}
+        self._all: Set[BetStatusSubscription] = set()
+        self._count = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def subscribe(self, bet_ids=(), event_ids=()) -> BetStatusSubscription:
+        """Подписка на ставки и события; без фильтров — на все расчёты"""
+        subscription = BetStatusSubscription(frozenset(bet_ids), frozenset(event_ids), self.queue_size)
+        for bet_id in subscription.bet_ids:
+            self._by_bet.setdefault(bet_id, set()).add(subscription)
+        for event_id in subscription.event_ids:
+            self._by_event.setdefault(event_id, set()).add(subscription)
+        if not subscription.bet_ids and not subscription.event_ids:
+            self._all.add(subscription)
+        self._count += 1
+        bet_stream_connections.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: BetStatusSubscription) -> None:
+        for bet_id in subscription.bet_ids:
+            self._discard(self._by_bet, bet_id, subscription)
+        for event_id in subscription.event_ids:
+            self._discard(self._by_event, event_id, subscription)
+        self._all.discard(subscription)
+        self._count -= 1
+        bet_stream_connections.inc(-1)
+
+    @staticmethod
+    def _discard(index: dict, key, subscription: BetStatusSubscription) -> None:
+        subscriptions = index.get(key)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del index[key]
+
+    def dispatch(self, message: dict) -> None:
+        """Раздача пачки рассчитанных ставок подходящим подключениям"""
+        event_id = message["event_id"]
+        status = message["status"]
+        bet_ids = message["bet_ids"]
+
+        whole = self._all | self._by_event.get(event_id, set())
+        for subscription in whole:
+            subscription.push(message)
+
+        # Подписанным на отдельные ставки отправляются только их ставки
+        matched: Dict[BetStatusSubscription, list] = {}
+        if self._by_bet:
+            for bet_id in bet_ids:
+                for subscription in self._by_bet.get(bet_id, ()):
+                    if subscription not in whole:
+                        matched.setdefault(subscription, []).append(bet_id)
+        for subscription, ids in matched.items():
+            subscription.push({"event_id": event_id, "status": status, "bet_ids": ids})
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Потеряна подписка на расчёты ставок, переподключение")
+                await asyncio.sleep(1)
+
+    async def _listen(self) -> None:
+        async with self.storage.redis.pubsub() as pubsub:
+            await pubsub.subscribe(self.storage.BETS_SETTLED_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    self.dispatch(json.loads(message["data"]))
+                except (ValueError, KeyError, TypeError):
+                    logger.warning("Некорректное сообщение о расчёте ставок: %r", message["data"])
+
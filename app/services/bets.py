@@ -1,116 +1,349 @@
-from typing import List, Optional
+import asyncio
+import base64
+import binascii
+import json
+import time
+from typing import List, Optional, Set, Tuple, Union
 from datetime import datetime
-from sqlalchemy import select
+from sqlalchemy import insert, select, update, tuple_
+from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models.bets import Bet, BetStatus
+from app.models.bets import BetRecord, BetStatus
 from app.models.events import Event, EventStatus
-from app.storage.postgres import BetDB
+from app.storage.postgres import BetArchiveDB, BetDB
+from app.storage.snapshots import event_snapshots
+from app.storage.redis import RedisStorage
+from app.storage.group_commit import BET_RETURNING, BetWriter
+from app.services.exposure import ExposureService, liability
+from app.services.rollups import naive_local, rollup_key
 from app.core.config import settings
+from app.core.metrics import settlement_batch_duration, settlement_batch_size
 from app.core.exceptions import (
     BetValidationError,
     EventNotFoundError,
-    DeadlinePassedError
+    DeadlinePassedError,
+    ExposureLimitError
 )
 
+# Те же колонки, что BET_RETURNING, из архива рассчитанных ставок
+ARCHIVE_RETURNING = (
+    BetArchiveDB.id,
+    BetArchiveDB.event_id,
+    BetArchiveDB.amount,
+    BetArchiveDB.status,
+    BetArchiveDB.created_at,
+    BetArchiveDB.coefficient,
+)
+
+# Фоновые задачи, которые должны пережить отменённый запрос
+_background: Set[asyncio.Task] = set()
+
+# Итоговый статус ставок в зависимости от исхода события
+SETTLEMENT_STATUSES = {
+    EventStatus.FIRST_TEAM_WON: BetStatus.WON,
+    EventStatus.SECOND_TEAM_WON: BetStatus.LOST,
+}
+
+
+def encode_cursor(created_at: datetime, bet_id: int) -> str:
+    """Непрозрачный курсор страницы по паре (created_at, id)"""
+    raw = json.dumps([created_at.isoformat(), bet_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, bet_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(bet_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise BetValidationError("Некорректный курсор страницы")
+
 
 class BetService:
-    def __init__(self, session: AsyncSession, event_service):
+    def __init__(
+            self,
+            session: AsyncSession,
+            event_service,
+            writer: Optional[BetWriter] = None,
+            exposure: Optional[ExposureService] = None,
+            storage: Optional[RedisStorage] = None
+    ):
         self.session = session
         self.event_service = event_service
+        self.writer = writer
+        self.exposure = exposure
+        # Через storage рассчитанные ставки публикуются подписчикам /bets/stream
+        self.storage = storage
 
-    async def create_bet(self, event_id: str, amount: float) -> Bet:
+    async def create_bet(self, event_id: str, amount: float) -> BetRecord:
         """Создание новой ставки"""
+        # Открытые и закрытые события решаются по индексу без запросов,
+        # остальные (новые у line provider, с неразборчивым дедлайном) - обычным путём
+        event = event_snapshots.get_open_event(event_id)
+        if event is not None:
+            self._check_amount(amount)
+        else:
+            event = await self.event_service.get_event(event_id)
+            self._check_bet(event_id, event, amount, datetime.now())
+
+        # Создаем ставку: INSERT ... RETURNING без отдельного чтения после коммита
+        values = {
+            "event_id": event_id,
+            "amount": amount,
+            "status": BetStatus.PENDING,
+            "coefficient": event.coefficient,
+            "created_at": datetime.now()
+        }
+        # Лимит риска проверяется и резервируется атомарно до записи ставки
+        reserved = [(event_id, amount, event.coefficient)]
+        if self.exposure is not None and not (await self.exposure.reserve(reserved))[0]:
+            raise ExposureLimitError(event_id)
+
+        if self.writer is not None:
+            pending = self.writer.submit(values)
+            try:
+                bet_db = await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Клиент ушёл, но ставка уже в пачке и будет записана без него:
+                # резерв снимается, только если не удастся сама запись
+                if self.exposure is not None:
+                    task = asyncio.create_task(self._release_if_failed(pending, reserved))
+                    _background.add(task)
+                    task.add_done_callback(_background.discard)
+                raise
+            except Exception:
+                if self.exposure is not None:
+                    await self.exposure.release(reserved)
+                raise
+            return BetRecord.from_row(bet_db)
+
+        try:
+            result = await self.session.execute(insert(BetDB).values(**values).returning(*BET_RETURNING))
+            bet_db = result.one()
+            await self.session.commit()
+        except BaseException:
+            if self.exposure is not None:
+                await self.exposure.release(reserved)
+            raise
+
+        return BetRecord.from_row(bet_db)
+
+    async def _release_if_failed(self, pending: asyncio.Future, reserved: List[Tuple[str, float, float]]) -> None:
+        try:
+            await pending
+        except Exception:
+            await self.exposure.release(reserved)
+
+    async def create_bets(self, bets: List[Tuple[str, float]]) -> List[Union[BetRecord, HTTPException]]:
+        """Пакетное создание ставок
+
+        События загружаются одним проходом по кэшу и line provider, все прошедшие
+        проверку ставки вставляются одним запросом. Результат идёт в порядке входа:
+        созданная ставка либо ошибка для этой позиции.
+        """
+        now = datetime.now()
+        results: List[Union[BetRecord, HTTPException, None]] = [None] * len(bets)
+
+        # Позиции, которые индекс открытых событий не смог решить сам
+        indexed = {}
+        unresolved = []
+        for position, (event_id, _) in enumerate(bets):
+            try:
+                event = event_snapshots.get_open_event(event_id)
+            except HTTPException as e:
+                results[position] = e
+                continue
+            if event is not None:
+                indexed[event_id] = event
+            else:
+                unresolved.append(event_id)
+        events, failed = await self.event_service.get_events_by_ids(unresolved) if unresolved else ({}, {})
+
+        values = []
+        positions = []
+        for position, (event_id, amount) in enumerate(bets):
+            if results[position] is not None:
+                continue
+            if event_id in failed:
+                # Событие не загрузилось: ошибка только у этой позиции
+                results[position] = failed[event_id]
+                continue
+            try:
+                if event_id in indexed:
+                    event = indexed[event_id]
+                    self._check_amount(amount)
+                else:
+                    event = events.get(event_id)
+                    self._check_bet(event_id, event, amount, now)
+            except HTTPException as e:
+                results[position] = e
+                continue
+            values.append({
+                "event_id": event_id,
+                "amount": amount,
+                "status": BetStatus.PENDING,
+                "coefficient": event.coefficient,
+                "created_at": now
+            })
+            positions.append(position)
+
+        if values and self.exposure is not None:
+            accepted = await self.exposure.reserve(
+                [(item["event_id"], item["amount"], item["coefficient"]) for item in values]
+            )
+            for position, item, ok in zip(positions, values, accepted):
+                if not ok:
+                    results[position] = ExposureLimitError(item["event_id"])
+            values = [item for item, ok in zip(values, accepted) if ok]
+            positions = [position for position, ok in zip(positions, accepted) if ok]
+
+        if values:
+            try:
+                result = await self.session.execute(
+                    insert(BetDB).returning(*BET_RETURNING, sort_by_parameter_order=True),
+                    values
+                )
+                rows = result.all()
+                await self.session.commit()
+            except BaseException:
+                if self.exposure is not None:
+                    await self.exposure.release(
+                        [(item["event_id"], item["amount"], item["coefficient"]) for item in values]
+                    )
+                raise
+            for position, bet_db in zip(positions, rows):
+                results[position] = BetRecord.from_row(bet_db)
+        return results
+
+    @staticmethod
+    def _check_bet(event_id: str, event: Optional[Event], amount: float, now: datetime) -> None:
+        """Проверка, что на событие можно поставить указанную сумму"""
         # Проверяем существование события
-        event = await self.event_service.get_event(event_id)
         if not event:
             raise EventNotFoundError(event_id)
 
         # Проверяем время дедлайна
         deadline = datetime.fromisoformat(event.deadline)
-        if deadline <= datetime.now():
+        if deadline <= now:
             raise DeadlinePassedError(event_id)
 
         # Валидируем сумму ставки
+        BetService._check_amount(amount)
+
+    @staticmethod
+    def _check_amount(amount: float) -> None:
+        """Проверка суммы ставки"""
         if not settings.MIN_BET_AMOUNT <= amount <= settings.MAX_BET_AMOUNT:
             raise BetValidationError(
                 f"Сумма ставки должна быть между {settings.MIN_BET_AMOUNT} и {settings.MAX_BET_AMOUNT}"
             )
 
-        # Создаем ставку
-        bet_db = BetDB(
-            event_id=event_id,
-            amount=amount,
-            coefficient=event.coefficient,
-            created_at=datetime.now()
-        )
-
-        self.session.add(bet_db)
-        await self.session.commit()
-        await self.session.refresh(bet_db)
-
-        return Bet(
-            id=bet_db.id,
-            event_id=bet_db.event_id,
-            amount=bet_db.amount,
-            status=bet_db.status,
-            created_at=bet_db.created_at,
-            coefficient=bet_db.coefficient
-        )
-
-    async def get_bets(self) -> List[Bet]:
-        """Получение списка всех ставок"""
-        query = select(BetDB).order_by(BetDB.created_at.desc())
+    async def get_bets(
+            self,
+            limit: Optional[int] = None,
+            cursor: Optional[str] = None,
+            event_id: Optional[str] = None,
+            status: Optional[BetStatus] = None,
+            created_from: Optional[datetime] = None,
+            created_to: Optional[datetime] = None
+    ) -> Tuple[List[BetRecord], Optional[str]]:
+        """Получение страницы ставок, от новых к старым
+
+        Возвращает ставки и курсор следующей страницы (None, если это последняя).
+        """
+        limit = limit or settings.BETS_PAGE_DEFAULT_LIMIT
+        query = select(*BET_RETURNING)
+        if event_id is not None:
+            query = query.where(BetDB.event_id == event_id)
+        if status is not None:
+            query = query.where(BetDB.status == status)
+        if created_from is not None:
+            query = query.where(BetDB.created_at >= naive_local(created_from))
+        if created_to is not None:
+            query = query.where(BetDB.created_at < naive_local(created_to))
+        if cursor is not None:
+            query = query.where(tuple_(BetDB.created_at, BetDB.id) < tuple_(*decode_cursor(cursor)))
+
+        # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+        query = query.order_by(BetDB.created_at.desc(), BetDB.id.desc()).limit(limit + 1)
         result = await self.session.execute(query)
-        bets_db = result.scalars().all()
-
-        return [
-            Bet(
-                id=bet.id,
-                event_id=bet.event_id,
-                amount=bet.amount,
-                status=bet.status,
-                created_at=bet.created_at,
-                coefficient=bet.coefficient
+        rows = result.all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+        return [BetRecord.from_row(row) for row in rows], next_cursor
+
+    async def get_bet(self, bet_id: int) -> Optional[BetRecord]:
+        """Получение информации о конкретной ставке
+
+        Рассчитанные ставки, перенесённые воркером архивации, ищутся в bets_archive.
+        """
+        result = await self.session.execute(select(*BET_RETURNING).where(BetDB.id == bet_id))
+        row = result.one_or_none()
+        if row is None:
+            result = await self.session.execute(select(*ARCHIVE_RETURNING).where(BetArchiveDB.id == bet_id))
+            row = result.one_or_none()
+        return BetRecord.from_row(row) if row is not None else None
+
+    async def update_bet_status(self, event_id: str, event_status: EventStatus) -> int:
+        """Обновление статуса ставок при изменении статуса события
+
+        Ставки рассчитываются пачками по SETTLEMENT_BATCH_SIZE, каждая пачка
+        фиксируется отдельной транзакцией. Уже рассчитанные ставки пропускаются,
+        поэтому прерванный расчёт можно безопасно запустить повторно.
+        Счётчики риска уменьшаются после каждой пачки, а в конце пересчитываются
+        по базе: сбой между коммитом пачки и обновлением Redis иначе оставил бы
+        их завышенными навсегда, ведь повторный расчёт эти ставки пропускает.
+        Возвращает количество рассчитанных ставок.
+        """
+        new_status = SETTLEMENT_STATUSES.get(event_status)
+        if new_status is None:
+            return 0
+
+        batch_size = settings.SETTLEMENT_BATCH_SIZE
+        pending = (BetDB.event_id == event_id, BetDB.status == BetStatus.PENDING)
+        settled = 0
+        while True:
+            started = time.perf_counter()
+            batch = (
+                select(BetDB.id)
+                .where(*pending)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
             )
-            for bet in bets_db
-        ]
-
-    async def get_bet(self, bet_id: int) -> Optional[Bet]:
-        """Получение информации о конкретной ставке"""
-        bet_db = await self.session.get(BetDB, bet_id)
-        if not bet_db:
-            return None
-
-        return Bet(
-            id=bet_db.id,
-            event_id=bet_db.event_id,
-            amount=bet_db.amount,
-            status=bet_db.status,
-            created_at=bet_db.created_at,
-            coefficient=bet_db.coefficient
-        )
-
-    async def update_bet_status(self, event_id: str, event_status: EventStatus) -> List[Bet]:
-        """Обновление статуса ставок при изменении статуса события"""
-        query = select(BetDB).where(BetDB.event_id == event_id)
-        result = await self.session.execute(query)
-        bets_db = result.scalars().all()
-
-        updated_bets = []
-        for bet_db in bets_db:
-            if event_status == EventStatus.FIRST_TEAM_WON:
-                bet_db.status = BetStatus.WON
-            elif event_status == EventStatus.SECOND_TEAM_WON:
-                bet_db.status = BetStatus.LOST
-
-            updated_bets.append(Bet(
-                id=bet_db.id,
-                event_id=bet_db.event_id,
-                amount=bet_db.amount,
-                status=bet_db.status,
-                created_at=bet_db.created_at,
-                coefficient=bet_db.coefficient
-            ))
-
-        await self.session.commit()
-        return updated_bets
+            query = (
+                update(BetDB)
+                .where(BetDB.id.in_(batch), *pending)
+                .values(status=new_status)
+                .returning(BetDB.id, BetDB.amount, BetDB.coefficient, BetDB.created_at)
+                .execution_options(synchronize_session=False)
+            )
+            result = await self.session.execute(query)
+            rows = result.all()
+            count = len(rows)
+            await self.session.commit()
+
+            if self.exposure is not None and rows:
+                # Один проход по кортежам без промежуточных объектов
+                total_amount = total_liability = 0.0
+                for _, amount, coefficient, _ in rows:
+                    total_amount += amount
+                    total_liability += liability(amount, coefficient)
+                await self.exposure.settle(event_id, total_amount, total_liability, count, new_status)
+            if self.storage is not None and rows:
+                await self.storage.publish_bets_settled(event_id, new_status.value, [row.id for row in rows])
+                # Ставки сменили статус: их часы в агрегатах нужно пересчитать
+                await self.storage.mark_rollups_dirty(list({rollup_key(row.created_at, event_id) for row in rows}))
+            settlement_batch_size.observe(count)
+            settlement_batch_duration.observe(time.perf_counter() - started)
+            settled += count
+            if count < batch_size:
+                break
+
+        if self.exposure is not None:
+            await self.exposure.rebuild(event_id, force=True)
+        return settled
@@ -0,0 +1,79 @@
+import time
+from enum import Enum
+from typing import Any, Awaitable, Callable
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"  # Запросы идут как обычно
+    OPEN = "open"  # Запросы сразу отклоняются
+    HALF_OPEN = "half_open"  # Пропускается ограниченное число пробных запросов
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Автомат защиты внешнего сервиса
+
+    После failure_threshold ошибок подряд цепь размыкается и запросы
+    отклоняются без обращения к сервису. Через recovery_timeout секунд
+    пропускается до half_open_max_calls пробных запросов: успех замыкает
+    цепь, ошибка снова размыкает её.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> CircuitState:
+        if self._state == CircuitState.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = CircuitState.HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == CircuitState.CLOSED:
+            return True
+        if state == CircuitState.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._state == CircuitState.HALF_OPEN or self._failures >= self.failure_threshold:
+            self._state = CircuitState.OPEN
+            self._opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Возврат места пробного запроса, который завершился без результата"""
+        if self._state == CircuitState.HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.allow_request():
+            raise CircuitOpenError("Цепь разомкнута")
+        try:
+            result = await func()
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Отменённая проба ничего не сказала о сервисе, но место должна освободить,
+            # иначе полуоткрытая цепь будет отклонять запросы навсегда
+            self.release_probe()
+            raise
+        self.record_success()
+        return result
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.models.events import Event, EventStatus
+from app.services.bets import SETTLEMENT_STATUSES
+from app.services.events import EventService
+from app.services.heartbeat import worker_id
+from app.storage.redis import RedisStorage
+from app.storage.snapshots import EventDiff, EventSnapshot, EventSnapshotStore, event_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+class EventPoller:
+    """Фоновый опрос line provider
+
+    Ведущий воркер (выбирается через Redis) раз в interval секунд забирает
+    события у line provider и публикует снимок в Redis, остальные воркеры
+    подхватывают опубликованный снимок. Каждый воркер держит снимок в памяти
+    и отвечает на запросы событий из него.
+    """
+
+    def __init__(
+            self,
+            storage: RedisStorage,
+            client: httpx.AsyncClient,
+            store: EventSnapshotStore = event_snapshots,
+            interval: float = settings.EVENT_POLL_INTERVAL
+    ):
+        self.storage = storage
+        self.event_service = EventService(storage, client)
+        self.store = store
+        self.interval = interval
+        self.worker_id = worker_id()
+        self.leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll_once()
+            except Exception:
+                logger.exception("Не удалось обновить снимок событий")
+            await asyncio.sleep(self.interval)
+
+    async def poll_once(self) -> None:
+        was_leader = self.leader
+        self.leader = await self.storage.acquire_leadership(
+            "event_poller",
+            self.worker_id,
+            ttl=max(int(self.interval * 3), 1)
+        )
+        if self.leader:
+            await self._poll_line_provider(was_leader)
+        else:
+            await self._load_published()
+
+    async def _poll_line_provider(self, was_leader: bool = True) -> None:
+        current = self.store.snapshot
+        # Статусы, от которых считаются переходы. Только что ставший ведущим воркер
+        # (после рестарта или смены ведущего) сверяется с последним опубликованным
+        # снимком, а не со своим: иначе все завершённые события ушли бы на расчёт заново.
+        if was_leader and current is not None:
+            published = {event_id: event.status for event_id, event in current.events.items()}
+        else:
+            published = await self._published_statuses()
+
+        events = await self.event_service.fetch_events()
+        fetched_at = time.time()
+
+        new_events = {event.event_id: event for event in events}
+        if current is not None and dict(current.events) == new_events:
+            # Ничего не изменилось: продлеваем жизнь снимка без смены версии
+            snapshot = EventSnapshot(version=current.version, events=current.events, fetched_at=fetched_at)
+        else:
+            version = await self.storage.next_events_snapshot_version()
+            snapshot = EventSnapshot.build(version, events, fetched_at)
+
+        await self.storage.publish_events_snapshot(snapshot.version, fetched_at, events)
+        await self.storage.cache_events(events)
+        self._apply(snapshot)
+
+        # На расчёт уходят только события, завершившиеся с прошлой публикации
+        for event in events:
+            if event.status in SETTLEMENT_STATUSES and published.get(event.event_id) != event.status:
+                await self.storage.publish_event_outcome(event.event_id, event.status.value)
+
+    async def _published_statuses(self) -> Dict[str, EventStatus]:
+        data = await self.storage.get_events_snapshot()
+        if data is None:
+            return {}
+        return {event["event_id"]: EventStatus(event["status"]) for event in data["events"]}
+
+    async def _load_published(self) -> None:
+        current = self.store.snapshot
+        if current is not None and current.age < self.interval:
+            version = await self.storage.get_events_snapshot_version()
+            if version <= current.version:
+                return
+
+        data = await self.storage.get_events_snapshot()
+        if data is None:
+            return
+        self._apply(EventSnapshot.build(
+            data["version"],
+            [Event(**event) for event in data["events"]],
+            data["fetched_at"]
+        ))
+
+    def _apply(self, snapshot: EventSnapshot) -> EventDiff:
+        diff = self.store.replace(snapshot)
+        if diff:
+            logger.info(
+                "Снимок событий v%s: добавлено %s, изменено %s, удалено %s",
+                snapshot.version, len(diff.added), len(diff.changed), len(diff.removed)
+            )
+        return diff
@@ -1,66 +1,297 @@
-from typing import List, Optional
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
 
 import httpx
 
 from app.models.events import Event
 from app.storage.redis import RedisStorage
+from app.storage.memory import event_cache, event_cache_stats, event_flight
+from app.storage.snapshots import deadline_timestamp, event_snapshots
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
 from app.core.config import settings
 from app.core.exceptions import LineProviderError
+from app.core.metrics import CallbackMetric, line_provider_errors, line_provider_request_duration, registry
+
+EVENTS_LIST_KEY = ("events_list",)
+
+# Общий для процесса автомат защиты line provider
+line_provider_breaker = CircuitBreaker(
+    failure_threshold=settings.LINE_PROVIDER_FAILURE_THRESHOLD,
+    recovery_timeout=settings.LINE_PROVIDER_RECOVERY_TIMEOUT,
+    half_open_max_calls=settings.LINE_PROVIDER_HALF_OPEN_MAX_CALLS
+)
+
+registry.register(CallbackMetric(
+    "event_cache_requests_total",
+    "Обращения к кэшу событий по результату",
+    lambda: (((name,), value) for name, value in event_cache_stats.as_dict().items()),
+    type="counter",
+    labelnames=("result",)
+))
+registry.register(CallbackMetric(
+    "line_provider_circuit_state",
+    "Состояние автомата защиты line provider (1 — текущее)",
+    lambda: (((state.value,), int(line_provider_breaker.state == state)) for state in CircuitState),
+    labelnames=("state",)
+))
 
 
 class EventService:
-    def __init__(self, storage: RedisStorage):
+    def __init__(self, storage: RedisStorage, client: httpx.AsyncClient):
         self.storage = storage
-        self.line_provider_url = settings.LINE_PROVIDER_URL
+        self.client = client
 
     async def get_events(self) -> List[Event]:
         """Получение списка доступных событий"""
-        # Пробуем получить из кэша
-        # cached_events = await self.storage.get_cached_events_list()
-        # if cached_events:
-        #     return [Event(**event) for event in cached_events]
+        snapshot = event_snapshots.fresh()
+        if snapshot is not None:
+            return list(snapshot.events.values())
 
+        events = event_cache.get(EVENTS_LIST_KEY)
+        if events is not None:
+            event_cache_stats.local_hits += 1
+            return events
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.line_provider_url}/events",
-                    timeout=settings.LINE_PROVIDER_TIMEOUT
-                )
-                response.raise_for_status()
-
-                events = []
-                for event in response.json()["data"]["events"]:
-                    events.append(Event(**event))
-
-
-                # for event in events:
-                #     await self.storage.cache_event(event)
-                # await self.storage.cache_events_list([event.dict() for event in events])
-                return events
-        except Exception as e:
-            raise LineProviderError(str(e))
+            return await event_flight.do(EVENTS_LIST_KEY, self._load_events)
+        except LineProviderError:
+            # Line provider недоступен: отдаём последний известный список
+            events = event_cache.get_stale(EVENTS_LIST_KEY)
+            if events is None:
+                cached_events = await self.storage.get_stale_events_list()
+                if cached_events is None:
+                    raise
+                events = [Event(**event) for event in cached_events]
+            event_cache_stats.stale_hits += 1
+            return events
+
+    async def get_open_events(self) -> List[Event]:
+        """События, на которые ещё принимаются ставки, от ближайшего дедлайна
+
+        При свежем снимке список берётся из индекса открытых событий.
+        """
+        if event_snapshots.fresh() is not None:
+            return event_snapshots.open_events.open_events()
+
+        now = time.time()
+        events = []
+        for event in await self.get_events():
+            deadline = deadline_timestamp(event)
+            if deadline > now:
+                events.append((deadline, event))
+        events.sort(key=lambda item: item[0])
+        return [event for _, event in events]
 
     async def get_event(self, event_id: str) -> Optional[Event]:
         """Получение информации о конкретном событии"""
-        # Пробуем получить из кэша
-        # cached_event = await self.storage.get_cached_event(event_id)
-        # if cached_event:
-        #     return cached_event
+        snapshot = event_snapshots.fresh()
+        if snapshot is not None and event_id in snapshot.events:
+            return snapshot.events[event_id]
+
+        key = ("event", event_id)
+        event = event_cache.get(key)
+        if event is not None:
+            event_cache_stats.local_hits += 1
+            return event
+        try:
+            return await event_flight.do(key, lambda: self._load_event(event_id))
+        except LineProviderError:
+            stale = await self._get_stale_events([event_id])
+            if event_id not in stale:
+                raise
+            return stale[event_id]
+
+    async def get_events_by_ids(
+            self,
+            event_ids: Iterable[str]
+    ) -> Tuple[Dict[str, Event], Dict[str, LineProviderError]]:
+        """Получение нескольких событий: память, затем один MGET, затем line provider
+
+        Возвращает найденные события и ошибки по событиям, которые не удалось
+        загрузить и для которых нет последней известной версии. Несуществующие
+        события не попадают ни туда, ни туда.
+        """
+        snapshot = event_snapshots.fresh()
+        snapshot_events = snapshot.events if snapshot is not None else {}
+        events = {}
+        missing = []
+        for event_id in dict.fromkeys(event_ids):
+            event = snapshot_events.get(event_id) or event_cache.get(("event", event_id))
+            if event is not None:
+                event_cache_stats.local_hits += 1
+                events[event_id] = event
+            else:
+                missing.append(event_id)
+        if not missing:
+            return events, {}
+
+        cached = await self.storage.get_cached_events(missing)
+        event_cache_stats.redis_hits += len(cached)
+        for event_id, event in cached.items():
+            event_cache.set(("event", event_id), event)
+        events.update(cached)
+
+        missing = [event_id for event_id in missing if event_id not in cached]
+        if missing:
+            event_cache_stats.misses += len(missing)
+            results = await asyncio.gather(
+                *(
+                    event_flight.do(("fetch", event_id), lambda event_id=event_id: self.fetch_event(event_id))
+                    for event_id in missing
+                ),
+                return_exceptions=True
+            )
+            fetched = [result for result in results if isinstance(result, Event)]
+            failed = {
+                event_id: result for event_id, result in zip(missing, results)
+                if isinstance(result, BaseException)
+            }
+            await self.storage.cache_events(fetched)
+            for event in fetched:
+                event_cache.set(("event", event.event_id), event)
+                events[event.event_id] = event
+
+            if failed:
+                stale = await self._get_stale_events(list(failed))
+                events.update(stale)
+                # Ошибка остаётся только у событий без последней известной версии
+                return events, {
+                    event_id: error if isinstance(error, LineProviderError) else LineProviderError(repr(error))
+                    for event_id, error in failed.items()
+                    if event_id not in stale
+                }
+        return events, {}
+
+    async def _get_stale_events(self, event_ids: List[str]) -> Dict[str, Event]:
+        """Последние известные версии событий из памяти и Redis"""
+        stale = {}
+        for event_id in event_ids:
+            event = event_cache.get_stale(("event", event_id))
+            if event is not None:
+                stale[event_id] = event
+        rest = [event_id for event_id in event_ids if event_id not in stale]
+        if rest:
+            stale.update(await self.storage.get_stale_events(rest))
+        event_cache_stats.stale_hits += len(stale)
+        return stale
+
+    async def _load_events(self) -> List[Event]:
+        """Загрузка списка событий из Redis или от line provider"""
+        cached_events = await self.storage.get_cached_events_list()
+        if cached_events is not None:
+            event_cache_stats.redis_hits += 1
+            events = [Event(**event) for event in cached_events]
+            event_cache.set(EVENTS_LIST_KEY, events)
+            return events
+
+        event_cache_stats.misses += 1
+        events = await self.fetch_events()
+
+        # Список и отдельные события кэшируются одним конвейером
+        await self.storage.cache_events(events)
+        await self.storage.cache_events_list([event.model_dump(mode="json") for event in events])
+        event_cache.set(EVENTS_LIST_KEY, events)
+        for event in events:
+            event_cache.set(("event", event.event_id), event)
+        return events
+
+    async def _load_event(self, event_id: str) -> Optional[Event]:
+        """Загрузка события из Redis или от line provider"""
+        key = ("event", event_id)
+        cached_event = await self.storage.get_cached_event(event_id)
+        if cached_event is not None:
+            event_cache_stats.redis_hits += 1
+            event_cache.set(key, cached_event)
+            return cached_event
 
         # Если нет в кэше, получаем от line provider
+        event_cache_stats.misses += 1
+        event = await self.fetch_event(event_id)
+        if event is None:
+            return None
+
+        # Кэшируем результат
+        await self.storage.cache_event(event)
+        event_cache.set(key, event)
+        return event
+
+    async def fetch_events(self) -> List[Event]:
+        """Получение списка событий от line provider в обход кэша"""
+        response = await self._request("/events")
+        if not response.is_success:
+            raise LineProviderError(f"HTTP {response.status_code}")
+        try:
+            events = []
+            for event in response.json()["data"]["events"]:
+                events.append(Event(**event))
+            return events
+        except Exception as e:
+            raise LineProviderError(str(e))
+
+    async def fetch_event(self, event_id: str) -> Optional[Event]:
+        """Получение события от line provider в обход кэша"""
+        response = await self._request(f"/events/{event_id}")
+        if response.status_code == 404:
+            return None
+        if not response.is_success:
+            raise LineProviderError(f"HTTP {response.status_code}")
+        try:
+            return Event(**response.json()["data"])
+        except Exception as e:
+            raise LineProviderError(str(e))
+
+    async def _request(self, path: str) -> httpx.Response:
+        """GET-запрос к line provider через автомат защиты
+
+        Ошибки соединения и ответы 5xx считаются отказами, 4xx возвращаются как есть.
+        """
+        async def send() -> httpx.Response:
+            response = await self.client.get(path)
+            if response.status_code >= 500:
+                raise LineProviderError(f"HTTP {response.status_code}")
+            return response
+
+        labels = ("events",) if path == "/events" else ("event",)
+        started = time.perf_counter()
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.line_provider_url}/events/{event_id}",
-                    timeout=settings.LINE_PROVIDER_TIMEOUT
-                )
-                response.raise_for_status()
-                event = Event(**response.json()["data"])
-
-                # Кэшируем результат
-                await self.storage.cache_event(event)
-                return event
+            return await line_provider_breaker.call(lambda: _hedged(send))
+        except CircuitOpenError:
+            line_provider_errors.inc(labels=(*labels, "circuit_open"))
+            raise LineProviderError("Line Provider временно недоступен")
         except httpx.HTTPError as e:
-            if e.response and e.response.status_code == 404:
-                return None
+            line_provider_errors.inc(labels=(*labels, type(e).__name__))
             raise LineProviderError(str(e))
+        except LineProviderError:
+            line_provider_errors.inc(labels=(*labels, "server_error"))
+            raise
+        finally:
+            line_provider_request_duration.observe(time.perf_counter() - started, labels)
+
+
+async def _hedged(send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+    """Повторный запрос, если первый не ответил за LINE_PROVIDER_HEDGE_DELAY_MS
+
+    Возвращается первый успешный ответ, оставшийся запрос отменяется.
+    """
+    delay = settings.LINE_PROVIDER_HEDGE_DELAY_MS / 1000
+    if delay <= 0:
+        return await send()
+
+    tasks = [asyncio.ensure_future(send())]
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks.append(asyncio.ensure_future(send()))
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
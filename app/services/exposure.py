@@ -0,0 +1,187 @@
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.bets import BetStatus
+from app.models.events import EventExposure
+from app.storage.postgres import BetArchiveDB, BetDB
+from app.storage.redis import RedisStorage
+
+# Резервирование ставок: проверка лимита и увеличение счётчиков одной атомарной операцией.
+# KEYS - ключи счётчиков событий, ARGV - лимит и тройки (сумма, ответственность) на каждую ставку.
+# Для каждой ставки возвращает 1 (принята), 0 (превышен лимит) или -1 (счётчики не инициализированы).
+RESERVE_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local result = {}
+for i, key in ipairs(KEYS) do
+    local amount = tonumber(ARGV[i * 2])
+    local liability = tonumber(ARGV[i * 2 + 1])
+    if redis.call('EXISTS', key) == 0 then
+        result[i] = -1
+    elseif limit > 0 and tonumber(redis.call('HGET', key, 'pending_liability') or '0') + liability > limit then
+        result[i] = 0
+    else
+        redis.call('HINCRBYFLOAT', key, 'pending_amount', amount)
+        redis.call('HINCRBYFLOAT', key, 'pending_liability', liability)
+        redis.call('HINCRBY', key, 'pending_bets', 1)
+        redis.call('HINCRBYFLOAT', key, 'turnover', amount)
+        redis.call('HINCRBY', key, 'bets', 1)
+        result[i] = 1
+    end
+end
+return result
+"""
+
+# Снятие суммы с ожидающих ставок: ARGV - сумма, ответственность, число ставок,
+# выплата и признак отмены (для отмены уменьшаются и оборот, и число ставок)
+RELEASE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HINCRBYFLOAT', KEYS[1], 'pending_amount', -tonumber(ARGV[1]))
+redis.call('HINCRBYFLOAT', KEYS[1], 'pending_liability', -tonumber(ARGV[2]))
+redis.call('HINCRBY', KEYS[1], 'pending_bets', -tonumber(ARGV[3]))
+redis.call('HINCRBYFLOAT', KEYS[1], 'payout', tonumber(ARGV[4]))
+if ARGV[5] == '1' then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'turnover', -tonumber(ARGV[1]))
+    redis.call('HINCRBY', KEYS[1], 'bets', -tonumber(ARGV[3]))
+end
+return 1
+"""
+
+# Инициализация счётчиков из базы, если их ещё никто не создал
+INIT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV))
+return 1
+"""
+
+EXPOSURE_FIELDS = ("pending_amount", "pending_liability", "pending_bets", "turnover", "bets", "payout")
+
+
+def liability(amount: float, coefficient: Optional[float]) -> float:
+    """Возможная выплата по ставке"""
+    return amount * (coefficient or 0.0)
+
+
+class ExposureService:
+    """Счётчики риска по событиям в Redis
+
+    Для каждого события хранятся сумма и возможная выплата по ожидающим
+    ставкам, оборот, число ставок и выплаты по выигравшим ставкам.
+    Счётчики меняются при создании и расчёте ставок, без чтения таблицы bets.
+    Если для события счётчиков нет, они один раз восстанавливаются из базы.
+    """
+
+    def __init__(self, storage: RedisStorage, session: AsyncSession):
+        self.storage = storage
+        self.session = session
+        self.EXPOSURE_PREFIX = "exposure:"
+        # Скрипты вызываются через EVALSHA, текст отправляется только при первом вызове
+        self._reserve_script = storage.redis.register_script(RESERVE_SCRIPT)
+        self._release_script = storage.redis.register_script(RELEASE_SCRIPT)
+        self._init_script = storage.redis.register_script(INIT_SCRIPT)
+
+    async def reserve(self, bets: List[Tuple[str, float, Optional[float]]]) -> List[bool]:
+        """Учёт новых ставок (событие, сумма, коэффициент) с проверкой лимита
+
+        Возвращает для каждой ставки, принята ли она. Отклонённые ставки
+        в счётчиках не учитываются.
+        """
+        if not bets:
+            return []
+        results = await self._reserve(bets)
+        uninitialized = {event_id for (event_id, _, _), result in zip(bets, results) if result == -1}
+        if uninitialized:
+            for event_id in uninitialized:
+                await self.rebuild(event_id)
+            retry = [position for position, result in enumerate(results) if result == -1]
+            for position, result in zip(retry, await self._reserve([bets[position] for position in retry])):
+                results[position] = result
+        return [result == 1 for result in results]
+
+    async def release(self, bets: List[Tuple[str, float, Optional[float]]]) -> None:
+        """Отмена учёта ставок, которые не удалось записать в базу"""
+        for event_id, totals in _group(bets).items():
+            await self._release(event_id, *totals, payout=0.0, cancel=True)
+
+    async def settle(self, event_id: str, amount: float, bets_liability: float, count: int, status: BetStatus) -> None:
+        """Перенос рассчитанных ставок из ожидающих"""
+        payout = bets_liability if status == BetStatus.WON else 0.0
+        await self._release(event_id, amount, bets_liability, count, payout=payout, cancel=False)
+
+    async def get_exposure(self, event_id: str) -> EventExposure:
+        key = f"{self.EXPOSURE_PREFIX}{event_id}"
+        values = await self.storage.redis.hmget(key, EXPOSURE_FIELDS)
+        if all(value is None for value in values):
+            await self.rebuild(event_id)
+            values = await self.storage.redis.hmget(key, EXPOSURE_FIELDS)
+        data = dict(zip(EXPOSURE_FIELDS, (float(value or 0) for value in values)))
+        return EventExposure(event_id=event_id, limit=settings.MAX_EVENT_EXPOSURE, **data)
+
+    async def rebuild(self, event_id: str, force: bool = False) -> None:
+        """Инициализация счётчиков события по таблицам bets и bets_archive
+
+        С force существующие счётчики перезаписываются: так расчёт ставок
+        исправляет расхождение после сбоя между коммитом и обновлением Redis.
+        """
+        # В архиве только рассчитанные ставки, но оборот и выплаты по ним остаются в счётчиках
+        parts = [
+            select(table.amount, table.coefficient, table.status).where(table.event_id == event_id)
+            for table in (BetDB, BetArchiveDB)
+        ]
+        bets = union_all(*parts).subquery()
+        pending = bets.c.status == BetStatus.PENDING
+        bet_liability = bets.c.amount * func.coalesce(bets.c.coefficient, 0)
+        query = select(
+            func.coalesce(func.sum(case((pending, bets.c.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((pending, bet_liability), else_=0)), 0),
+            func.count().filter(pending),
+            func.coalesce(func.sum(bets.c.amount), 0),
+            func.count(),
+            func.coalesce(func.sum(case((bets.c.status == BetStatus.WON, bet_liability), else_=0)), 0),
+        )
+        row = (await self.session.execute(query)).one()
+
+        key = f"{self.EXPOSURE_PREFIX}{event_id}"
+        if force:
+            await self.storage.redis.hset(key, mapping={name: str(value) for name, value in zip(EXPOSURE_FIELDS, row)})
+            return
+        mapping = []
+        for name, value in zip(EXPOSURE_FIELDS, row):
+            mapping.extend([name, str(value)])
+        await self._init_script(keys=[key], args=mapping)
+
+    async def _reserve(self, bets: List[Tuple[str, float, Optional[float]]]) -> List[int]:
+        keys = [f"{self.EXPOSURE_PREFIX}{event_id}" for event_id, _, _ in bets]
+        args = [settings.MAX_EVENT_EXPOSURE or 0]
+        for _, amount, coefficient in bets:
+            args.extend([amount, liability(amount, coefficient)])
+        return list(await self._reserve_script(keys=keys, args=args))
+
+    async def _release(
+            self,
+            event_id: str,
+            amount: float,
+            bets_liability: float,
+            count: int,
+            payout: float,
+            cancel: bool
+    ) -> None:
+        await self._release_script(
+            keys=[f"{self.EXPOSURE_PREFIX}{event_id}"],
+            args=[amount, bets_liability, count, payout, "1" if cancel else "0"]
+        )
+
+
+def _group(bets: List[Tuple[str, float, Optional[float]]]) -> Dict[str, Tuple[float, float, int]]:
+    """Суммы, ответственность и число ставок по событиям"""
+    totals: Dict[str, Tuple[float, float, int]] = {}
+    for event_id, amount, coefficient in bets:
+        total_amount, total_liability, count = totals.get(event_id, (0.0, 0.0, 0))
+        totals[event_id] = (total_amount + amount, total_liability + liability(amount, coefficient), count + 1)
+    return totals
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.storage.memory import event_cache
+from app.storage.redis import RedisStorage
+from app.storage.snapshots import event_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+def worker_id() -> str:
+    """Идентификатор текущего процесса среди воркеров всех хостов"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkerHeartbeat:
+    """Периодическая отметка воркера API в Redis
+
+    Вместе с отметкой публикуется состояние локальных кэшей, чтобы по
+    /health/workers было видно отставший или потерявший подписку воркер, и
+    снимок метрик процесса, из которых /metrics собирает общую выгрузку.
+    """
+
+    def __init__(
+            self,
+            storage: RedisStorage,
+            listener=None,
+            poller=None,
+            interval: float = settings.WORKER_HEARTBEAT_INTERVAL
+    ):
+        self.storage = storage
+        self.listener = listener
+        self.poller = poller
+        self.interval = interval
+        self.worker_id = worker_id()
+        self.started_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        try:
+            await self.beat()
+        except Exception:
+            logger.exception("Не удалось отметить воркер в Redis")
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        try:
+            await self.storage.remove_heartbeat(self.worker_id)
+        except Exception:
+            logger.warning("Не удалось снять отметку воркера %s", self.worker_id)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.beat()
+            except Exception:
+                logger.exception("Не удалось отметить воркер в Redis")
+
+    async def beat(self) -> None:
+        ttl = max(int(self.interval * 3), 1)
+        await self.storage.record_heartbeat(self.worker_id, self.info(), ttl=ttl)
+        await self.storage.record_worker_metrics(self.worker_id, registry.families(self.worker_id), ttl=ttl)
+
+    def info(self) -> dict:
+        snapshot = event_snapshots.snapshot
+        return {
+            "worker_id": self.worker_id,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "last_seen": time.time(),
+            "event_cache_size": len(event_cache),
+            "snapshot_version": snapshot.version if snapshot is not None else None,
+            "snapshot_age": round(snapshot.age, 3) if snapshot is not None else None,
+            "invalidation_connected": self.listener.connected if self.listener is not None else None,
+            "event_poller_leader": self.poller.leader if self.poller is not None else None,
+        }
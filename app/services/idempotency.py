@@ -0,0 +1,84 @@
+import asyncio
+from typing import Awaitable, Callable
+
+from app.core.config import settings
+from app.core.exceptions import IdempotencyConflictError, IdempotencyKeyMismatchError
+from app.storage.memory import SingleFlight
+from app.storage.redis import RedisStorage
+
+IN_FLIGHT = "in_flight"
+COMPLETED = "completed"
+
+# Дубликаты внутри одного процесса ждут общую задачу, не опрашивая Redis
+idempotency_flight = SingleFlight()
+
+
+class IdempotencyService:
+    def __init__(self, storage: RedisStorage):
+        self.storage = storage
+
+    async def execute(
+            self,
+            key: str,
+            fingerprint: str,
+            handler: Callable[[], Awaitable[dict]],
+            client: str
+    ) -> dict:
+        """Выполнение запроса не более одного раза на ключ идемпотентности клиента
+
+        Первый ответ сохраняется в Redis и отдаётся повторно без вызова handler.
+        Одновременные дубликаты дожидаются исходного запроса. Ключи действуют в
+        пределах клиента (client_id): совпавший ключ другого клиента не получит
+        чужой ответ и не заблокирует чужой запрос.
+        """
+        scoped_key = f"{client}:{key}"
+        return await idempotency_flight.do(
+            (scoped_key, fingerprint),
+            lambda: self._execute(key, scoped_key, fingerprint, handler)
+        )
+
+    async def _execute(
+            self,
+            key: str,
+            scoped_key: str,
+            fingerprint: str,
+            handler: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.IDEMPOTENCY_WAIT_TIMEOUT
+        while True:
+            record = await self.storage.get_idempotency_record(scoped_key)
+            if record is None:
+                reserved = await self.storage.reserve_idempotency_key(
+                    scoped_key,
+                    {"state": IN_FLIGHT, "fingerprint": fingerprint},
+                    settings.IDEMPOTENCY_LOCK_TTL
+                )
+                if reserved:
+                    return await self._run(scoped_key, fingerprint, handler)
+                continue
+
+            if record["fingerprint"] != fingerprint:
+                raise IdempotencyKeyMismatchError(key)
+            if record["state"] == COMPLETED:
+                return record["response"]
+
+            # Запрос с этим ключом обрабатывает другой воркер
+            if loop.time() >= deadline:
+                raise IdempotencyConflictError(key)
+            await asyncio.sleep(settings.IDEMPOTENCY_POLL_INTERVAL)
+
+    async def _run(self, scoped_key: str, fingerprint: str, handler: Callable[[], Awaitable[dict]]) -> dict:
+        try:
+            response = await handler()
+        except BaseException:
+            # Неуспешный запрос не запоминаем, повтор выполнится заново
+            await self.storage.release_idempotency_key(scoped_key)
+            raise
+
+        await self.storage.save_idempotency_record(
+            scoped_key,
+            {"state": COMPLETED, "fingerprint": fingerprint, "response": response},
+            settings.IDEMPOTENCY_TTL
+        )
+        return response
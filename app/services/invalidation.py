@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError
+from redis import asyncio as aioredis
+
+from app.core.exceptions import LineProviderError
+from app.models.events import Event, EventChange
+from app.services.bets import SETTLEMENT_STATUSES
+from app.services.events import EVENTS_LIST_KEY, EventService
+from app.storage.memory import event_cache
+from app.storage.redis import RedisStorage
+from app.storage.snapshots import event_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+def apply_event_change(message: dict) -> None:
+    """Применение изменения события к кэшам текущего процесса
+
+    Сообщение содержит изменение ("change") и, если оно известно, полное
+    обновлённое событие ("event"). Без него событие вытесняется из кэша
+    и при следующем обращении будет загружено заново, а в снимке к
+    известному событию применяется само изменение: удалять живое событие
+    из снимка и индекса открытых до следующего опроса нельзя.
+    """
+    change = EventChange(**message["change"])
+    event_cache.delete(EVENTS_LIST_KEY)
+    if message.get("event") is not None:
+        event = Event(**message["event"])
+        event_cache.set(("event", event.event_id), event)
+        event_snapshots.patch(updated=[event])
+    else:
+        event_cache.delete(("event", change.event_id))
+        snapshot = event_snapshots.snapshot
+        current = snapshot.events.get(change.event_id) if snapshot is not None else None
+        if current is not None:
+            event_snapshots.patch(updated=[change.apply(current)])
+
+
+class EventChangeService:
+    def __init__(self, storage: RedisStorage, event_service: Optional[EventService] = None):
+        self.storage = storage
+        self.event_service = event_service
+
+    async def apply_changes(self, changes: List[EventChange], trusted: bool = False) -> List[Event]:
+        """Применение изменений от line provider ко всем уровням кэша
+
+        Известные события обновляются в Redis на месте, неизвестные удаляются.
+        Затем изменения рассылаются всем воркерам. Возвращает обновлённые события.
+
+        Расчёт ставок необратим, поэтому исходы отправляются на расчёт сразу
+        только из доверенного источника (trusted, webhook с проверенным токеном).
+        Остальные исходы сверяются с line provider, неподтверждённые пропускаются:
+        настоящий исход придёт с фоновым опросом.
+        """
+        known = await self._known_events([change.event_id for change in changes])
+        updated: Dict[str, Event] = {}
+        for change in changes:
+            current = updated.get(change.event_id) or known.get(change.event_id)
+            if current is not None:
+                updated[change.event_id] = change.apply(current)
+
+        unknown = [change.event_id for change in changes if change.event_id not in updated]
+        await self.storage.invalidate_events(unknown)
+        await self.storage.cache_events(list(updated.values()))
+
+        messages = [
+            {
+                "change": change.model_dump(mode="json"),
+                "event": updated[change.event_id].model_dump(mode="json") if change.event_id in updated else None,
+                "cached": True
+            }
+            for change in changes
+        ]
+        for message in messages:
+            apply_event_change(message)
+        await self.storage.publish_event_changes(messages)
+
+        # Завершённые события отправляются на расчёт ставок
+        for change in changes:
+            if change.status not in SETTLEMENT_STATUSES:
+                continue
+            if trusted or await self._confirm_outcome(change):
+                await self.storage.publish_event_outcome(change.event_id, change.status.value)
+            else:
+                logger.warning("Исход события %s (%s) не подтверждён line provider", change.event_id, change.status.value)
+        return list(updated.values())
+
+    async def _confirm_outcome(self, change: EventChange) -> bool:
+        """Совпадает ли исход с состоянием события в line provider"""
+        if self.event_service is None:
+            return False
+        try:
+            event = await self.event_service.fetch_event(change.event_id)
+        except LineProviderError:
+            return False
+        return event is not None and event.status == change.status
+
+    async def _known_events(self, event_ids: List[str]) -> Dict[str, Event]:
+        """Последние известные версии событий без обращения к line provider"""
+        snapshot = event_snapshots.snapshot
+        known = {}
+        for event_id in event_ids:
+            event = (snapshot.events.get(event_id) if snapshot else None) or event_cache.get_stale(("event", event_id))
+            if event is not None:
+                known[event_id] = event
+        rest = [event_id for event_id in event_ids if event_id not in known]
+        if rest:
+            known.update(await self.storage.get_stale_events(rest))
+        return known
+
+
+class EventChangeListener:
+    """Подписка воркера на канал изменений событий в Redis
+
+    Сообщения в канал публикует EventChangeService, но их может слать и сам
+    line provider: сообщение без "cached" дополнительно удаляет событие из Redis.
+    """
+
+    def __init__(self, redis: aioredis.Redis):
+        self.storage = RedisStorage(redis)
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.connected = False
+                logger.exception("Потеряна подписка на изменения событий, переподключение")
+                # Пока подписки не было, изменения могли потеряться
+                event_cache.clear()
+                await asyncio.sleep(1)
+
+    async def _listen(self) -> None:
+        async with self.storage.redis.pubsub() as pubsub:
+            await pubsub.subscribe(self.storage.EVENT_CHANGES_CHANNEL)
+            self.connected = True
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    await self._handle(json.loads(message["data"]))
+                except (ValueError, KeyError, ValidationError):
+                    logger.warning("Некорректное сообщение об изменении события: %r", message["data"])
+
+    async def _handle(self, message: dict) -> None:
+        if "change" not in message:
+            # Сообщение прислано line provider напрямую, в формате EventChange
+            message = {"change": message}
+        if not message.get("cached"):
+            await self.storage.invalidate_events([message["change"]["event_id"]])
+        apply_event_change(message)
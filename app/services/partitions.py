@@ -0,0 +1,55 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.config import settings
+from app.services.heartbeat import worker_id
+from app.storage.partitions import ensure_bets_partitions
+from app.storage.redis import RedisStorage
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionMaintainer:
+    """Периодическое создание партиций bets на BETS_PARTITIONS_AHEAD месяцев вперёд
+
+    Запуска при старте мало: процесс, проживший дольше запаса месяцев, упёрся бы
+    в отсутствующую партицию, и вставки ставок падали бы. Проверку выполняет
+    ведущий воркер (выбирается через Redis), чтобы DDL не шёл из всех процессов сразу.
+    """
+
+    def __init__(self, storage: RedisStorage, interval: float = settings.BETS_PARTITIONS_CHECK_INTERVAL):
+        self.storage = storage
+        self.interval = interval
+        self.worker_id = worker_id()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Не удалось создать партиции bets")
+
+    async def run_once(self) -> bool:
+        """Одна проверка; возвращает, выполнял ли её этот воркер"""
+        leader = await self.storage.acquire_leadership(
+            "bets_partitions",
+            self.worker_id,
+            ttl=max(int(self.interval * 3), 1)
+        )
+        if leader:
+            await ensure_bets_partitions()
+        return leader
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.exceptions import ReportRangeError
+from app.models.bets import BetStatus
+from app.models.reports import BetsReport, ReportBucket, ReportGranularity
+from app.services.rollups import hour_bucket, naive_local
+from app.storage.postgres import BetRollupDB
+
+GRANULARITY_STEPS = {
+    ReportGranularity.HOUR: timedelta(hours=1),
+    ReportGranularity.DAY: timedelta(days=1),
+}
+
+
+def _sum_for(status: BetStatus, column):
+    return func.sum(case((BetRollupDB.status == status, column), else_=0))
+
+
+class ReportService:
+    """Отчёты по ставкам из почасовых агрегатов bet_rollups_hourly
+
+    Запрос читает не больше (часов в периоде) x (событий) x (статусов) строк
+    агрегатов, независимо от количества ставок. Данные отстают от таблицы
+    ставок не больше чем на ROLLUP_INTERVAL.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def get_report(
+            self,
+            granularity: ReportGranularity,
+            created_from: datetime,
+            created_to: datetime,
+            event_id: Optional[str] = None
+    ) -> BetsReport:
+        created_from = hour_bucket(naive_local(created_from))
+        created_to = naive_local(created_to)
+        if created_to <= created_from:
+            raise ReportRangeError("Конец периода должен быть позже начала")
+        if (created_to - created_from) / GRANULARITY_STEPS[granularity] > settings.REPORT_MAX_BUCKETS:
+            raise ReportRangeError(
+                f"Период слишком длинный: больше {settings.REPORT_MAX_BUCKETS} интервалов, "
+                "сократите период или укрупните интервал"
+            )
+
+        buckets = await self._get_buckets(granularity, created_from, created_to, event_id)
+        total = ReportBucket()
+        for bucket in buckets:
+            for field in ReportBucket.model_fields:
+                if field != "bucket":
+                    setattr(total, field, getattr(total, field) + getattr(bucket, field))
+        return BetsReport(granularity=granularity, event_id=event_id, buckets=buckets, total=total)
+
+    async def _get_buckets(
+            self,
+            granularity: ReportGranularity,
+            created_from: datetime,
+            created_to: datetime,
+            event_id: Optional[str]
+    ) -> List[ReportBucket]:
+        bucket = func.date_trunc(granularity.value, BetRollupDB.bucket)
+        query = (
+            select(
+                bucket,
+                func.sum(BetRollupDB.bets),
+                func.sum(BetRollupDB.amount),
+                func.sum(BetRollupDB.payout),
+                _sum_for(BetStatus.PENDING, BetRollupDB.bets),
+                _sum_for(BetStatus.WON, BetRollupDB.bets),
+                _sum_for(BetStatus.LOST, BetRollupDB.bets),
+                _sum_for(BetStatus.PENDING, BetRollupDB.amount),
+            )
+            .where(BetRollupDB.bucket >= created_from, BetRollupDB.bucket < created_to)
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        if event_id is not None:
+            query = query.where(BetRollupDB.event_id == event_id)
+
+        result = await self.session.execute(query)
+        return [
+            ReportBucket(
+                bucket=start,
+                bets=bets,
+                amount=amount,
+                payout=payout,
+                pending_bets=pending_bets,
+                won_bets=won_bets,
+                lost_bets=lost_bets,
+                pending_amount=pending_amount,
+                settled_amount=amount - pending_amount
+            )
+            for start, bets, amount, payout, pending_bets, won_bets, lost_bets, pending_amount in result.all()
+        ]
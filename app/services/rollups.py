@@ -0,0 +1,177 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.models.bets import BetStatus
+from app.storage.postgres import AsyncSessionLocal, BetArchiveDB, BetDB, BetRollupDB
+from app.storage.redis import RedisStorage
+
+HOUR = timedelta(hours=1)
+
+
+def naive_local(moment: Optional[datetime]) -> Optional[datetime]:
+    """Момент в наивном локальном времени, в котором пишется created_at ставок
+
+    Ставки создаются с datetime.now(), поэтому время с часовым поясом из запроса
+    переводится в локальное, иначе сравнение с колонкой без пояса падает.
+    """
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone().replace(tzinfo=None)
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    """Начало часа, к которому относится момент"""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_key(created_at: datetime, event_id: str) -> str:
+    """Метка часа и события для множества на пересчёт"""
+    return f"{created_at:%Y%m%d%H}:{event_id}"
+
+
+def parse_rollup_key(key: str) -> Tuple[datetime, str]:
+    hour, event_id = key.split(":", 1)
+    return datetime.strptime(hour, "%Y%m%d%H"), event_id
+
+
+class RollupAggregator:
+    """Пересчёт почасовых агрегатов ставок
+
+    Агрегаты строятся из таблицы ставок, а не счётчиками на пути записи:
+    вставка и расчёт ставок не блокируют общие строки агрегатов. Каждый проход
+    пересчитывает текущий и предыдущий час (туда попадают новые ставки) и часы,
+    которые расчёт ставок пометил в Redis. Пересчёт часа идемпотентен, поэтому
+    повторный или прерванный проход безопасен.
+    """
+
+    def __init__(
+            self,
+            storage: RedisStorage,
+            session_factory: async_sessionmaker = AsyncSessionLocal,
+            batch_size: int = settings.ROLLUP_BATCH_SIZE
+    ):
+        self.storage = storage
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    async def run_once(self, now: Optional[datetime] = None) -> int:
+        """Один проход; возвращает количество пересчитанных часов"""
+        current = hour_bucket(now or datetime.now())
+        await self.refresh(current - HOUR, current + HOUR)
+        refreshed = 2
+
+        while True:
+            keys = await self.storage.pop_dirty_rollups(self.batch_size)
+            if not keys:
+                return refreshed
+            try:
+                refreshed += await self.refresh_keys(keys)
+            except Exception:
+                # Возвращаем метки, чтобы пересчитать их в следующий проход
+                await self.storage.mark_rollups_dirty(keys)
+                raise
+            if len(keys) < self.batch_size:
+                return refreshed
+
+    async def refresh_keys(self, keys: Iterable[str]) -> int:
+        """Пересчёт помеченных пар (час, событие) одной транзакцией"""
+        events_by_hour: Dict[datetime, List[str]] = defaultdict(list)
+        for key in set(keys):
+            hour, event_id = parse_rollup_key(key)
+            events_by_hour[hour].append(event_id)
+
+        async with self.session_factory() as session:
+            for hour, event_ids in events_by_hour.items():
+                await self._rebuild(session, hour, hour + HOUR, event_ids)
+            await session.commit()
+        return len(events_by_hour)
+
+    async def refresh(self, start: datetime, end: datetime) -> None:
+        """Пересчёт всех событий за часы [start, end) одной транзакцией"""
+        async with self.session_factory() as session:
+            await self._rebuild(session, hour_bucket(start), end)
+            await session.commit()
+
+    async def backfill(self, step: timedelta = timedelta(days=1)) -> int:
+        """Построение агрегатов по всей истории ставок окнами по step"""
+        bounds = []
+        async with self.session_factory() as session:
+            for table in (BetDB, BetArchiveDB):
+                bounds.extend((await session.execute(
+                    select(func.min(table.created_at), func.max(table.created_at))
+                )).one())
+        bounds = [moment for moment in bounds if moment is not None]
+        if not bounds:
+            return 0
+        first, last = min(bounds), max(bounds)
+
+        windows = 0
+        start, end = hour_bucket(first), hour_bucket(last) + HOUR
+        while start < end:
+            await self.refresh(start, min(start + step, end))
+            start += step
+            windows += 1
+        return windows
+
+    @staticmethod
+    async def _rebuild(
+            session: AsyncSession,
+            start: datetime,
+            end: datetime,
+            event_ids: Optional[List[str]] = None
+    ) -> None:
+        rollup_scope = [BetRollupDB.bucket >= start, BetRollupDB.bucket < end]
+        if event_ids is not None:
+            rollup_scope.append(BetRollupDB.event_id.in_(event_ids))
+
+        # Удаляем старые строки: у часа могли пропасть ставки в статусе PENDING
+        await session.execute(delete(BetRollupDB).where(*rollup_scope))
+
+        # Рассчитанные ставки могли уехать в архив, агрегаты считаются по обеим таблицам.
+        # Перенос в архив атомарен, поэтому ставка видна ровно в одной из них.
+        parts = []
+        for table in (BetDB, BetArchiveDB):
+            scope = [table.created_at >= start, table.created_at < end]
+            if event_ids is not None:
+                scope.append(table.event_id.in_(event_ids))
+            parts.append(
+                select(table.created_at, table.event_id, table.status, table.amount, table.coefficient)
+                .where(*scope)
+            )
+        bets = union_all(*parts).subquery()
+
+        bucket = func.date_trunc("hour", bets.c.created_at)
+        source = (
+            select(
+                bucket,
+                bets.c.event_id,
+                bets.c.status,
+                func.count(),
+                func.sum(bets.c.amount),
+                func.sum(case(
+                    (bets.c.status == BetStatus.WON, bets.c.amount * func.coalesce(bets.c.coefficient, 0.0)),
+                    else_=0.0
+                ))
+            )
+            .group_by(bucket, bets.c.event_id, bets.c.status)
+        )
+        query = insert(BetRollupDB).from_select(
+            ["bucket", "event_id", "status", "bets", "amount", "payout"],
+            source
+        )
+        # Параллельный проход мог вставить тот же час раньше нас
+        query = query.on_conflict_do_update(
+            index_elements=["bucket", "event_id", "status"],
+            set_={
+                "bets": query.excluded.bets,
+                "amount": query.excluded.amount,
+                "payout": query.excluded.payout,
+            }
+        )
+        await session.execute(query)
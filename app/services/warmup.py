@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+from redis import asyncio as aioredis
+from sqlalchemy import insert, select, text
+
+from app.core.config import settings
+from app.models.bets import BetStatus
+from app.services.events import EventService, line_provider_breaker
+from app.storage.group_commit import BET_RETURNING
+from app.storage.postgres import BetDB, engine
+from app.storage.redis import RedisStorage
+from app.storage.snapshots import event_snapshots
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Прогрев процесса после старта и проверка готовности к трафику
+
+    Прогрев открывает соединения к PostgreSQL и Redis, готовит запросы
+    ставок в кэше подготовленных выражений asyncpg каждого соединения и
+    загружает события. Все шаги обязательны: пока хотя бы один не прошёл,
+    /ready отвечает 503, а неудавшиеся шаги повторяются с паузой от
+    WARMUP_RETRY_INTERVAL до WARMUP_RETRY_MAX_INTERVAL секунд.
+    """
+
+    def __init__(self, redis: aioredis.Redis, client: httpx.AsyncClient):
+        self.redis = redis
+        self.client = client
+        self.done = False
+        self.attempts = 0
+        self.duration: Optional[float] = None
+        self.errors: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def run(self) -> None:
+        started = time.perf_counter()
+        steps: Dict[str, Callable[[], Awaitable[None]]] = {
+            "database": self._warm_database,
+            "redis": self._warm_redis,
+            "events": self._warm_events,
+        }
+        pending = list(steps)
+        delay = settings.WARMUP_RETRY_INTERVAL
+        while True:
+            self.attempts += 1
+            results = await asyncio.gather(
+                *(asyncio.wait_for(steps[name](), timeout=settings.WARMUP_TIMEOUT) for name in pending),
+                return_exceptions=True
+            )
+            for name, result in zip(pending, results):
+                if isinstance(result, BaseException):
+                    self.errors[name] = repr(result)
+                    logger.warning("Прогрев %s не удался (попытка %s): %r", name, self.attempts, result)
+                else:
+                    self.errors.pop(name, None)
+            pending = [name for name in pending if name in self.errors]
+            if not pending:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, settings.WARMUP_RETRY_MAX_INTERVAL)
+
+        self.duration = time.perf_counter() - started
+        self.done = True
+        logger.info("Прогрев завершён за %.2f с", self.duration)
+
+    async def _warm_database(self) -> None:
+        # Соединения открываются одновременно, чтобы пул действительно вырос до нужного размера
+        connections = min(settings.WARMUP_DB_CONNECTIONS, settings.DATABASE_POOL_SIZE)
+        await asyncio.gather(*(self._prepare_bet_queries() for _ in range(connections)))
+
+    @staticmethod
+    async def _prepare_bet_queries() -> None:
+        """Выполнение запросов ставок в том же виде, что и в BetService
+
+        Подготовленные выражения кэшируются по тексту SQL в каждом соединении,
+        поэтому запросы должны совпадать с боевыми. Вставка откатывается.
+        """
+        async with engine.connect() as conn:
+            await conn.execute(
+                select(*BET_RETURNING)
+                .order_by(BetDB.created_at.desc(), BetDB.id.desc())
+                .limit(1)
+            )
+            await conn.execute(select(*BET_RETURNING).where(BetDB.id == 0))
+            await conn.execute(insert(BetDB).values(
+                event_id="warmup",
+                amount=0.0,
+                status=BetStatus.PENDING,
+                coefficient=None,
+                created_at=datetime.now()
+            ).returning(*BET_RETURNING))
+            await conn.rollback()
+
+    async def _warm_redis(self) -> None:
+        await asyncio.gather(*(self.redis.ping() for _ in range(settings.WARMUP_REDIS_CONNECTIONS)))
+
+    async def _warm_events(self) -> None:
+        await EventService(RedisStorage(self.redis), self.client).get_events()
+
+    async def probe(self) -> dict:
+        """Состояние зависимостей с задержками проверок в миллисекундах"""
+        database, redis = await asyncio.gather(self._probe_database(), self._probe_redis())
+        snapshot = event_snapshots.snapshot
+        # done выставляется, только когда все шаги прогрева прошли
+        ready = self.done and database["ok"] and redis["ok"]
+        return {
+            "ready": ready,
+            "warmup": {
+                "done": self.done,
+                "attempts": self.attempts,
+                "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+                "errors": self.errors,
+            },
+            "database": database,
+            "redis": redis,
+            # После прогрева line provider не влияет на готовность: события отдаются и из кэша
+            "line_provider": {
+                "circuit": line_provider_breaker.state.value,
+                "snapshot_age_s": round(snapshot.age, 3) if snapshot is not None else None,
+            },
+        }
+
+    @staticmethod
+    async def _probe_database() -> dict:
+        return await _probe(_select_one)
+
+    async def _probe_redis(self) -> dict:
+        return await _probe(self.redis.ping)
+
+
+async def _select_one() -> None:
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+async def _probe(check) -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), timeout=settings.READINESS_PROBE_TIMEOUT)
+    except Exception as e:
+        return {"ok": False, "latency_ms": round((time.perf_counter() - started) * 1000, 3), "error": repr(e)}
+    return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 3)}
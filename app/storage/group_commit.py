@@ -0,0 +1,145 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.storage.postgres import AsyncSessionLocal, BetDB
+
+# Колонки, возвращаемые вставкой ставки
+BET_RETURNING = (
+    BetDB.id,
+    BetDB.event_id,
+    BetDB.amount,
+    BetDB.status,
+    BetDB.created_at,
+    BetDB.coefficient,
+)
+
+_Pending = Tuple[Dict[str, Any], asyncio.Future]
+
+
+class BetWriter:
+    """Групповая фиксация ставок
+
+    Одновременные вставки собираются в пачку (не больше max_batch и не дольше
+    window секунд ожидания) и записываются одним INSERT ... RETURNING в одной
+    транзакции. Пока идёт запись пачки, копится следующая, поэтому число
+    ставок на один коммит растёт вместе с нагрузкой.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+            max_batch: int = settings.BET_GROUP_COMMIT_MAX_BATCH,
+            window: float = settings.BET_GROUP_COMMIT_WINDOW_MS / 1000
+    ):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.window = window
+        self._queue: "asyncio.Queue[Optional[_Pending]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Дописывает накопленные ставки и останавливает запись"""
+        self._closing = True
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+
+    def submit(self, values: Dict[str, Any]) -> asyncio.Future:
+        """Постановка ставки в ближайшую пачку
+
+        Будущее разрешается строкой вставки или ошибкой записи. Отмена ожидающего
+        не отзывает ставку из пачки: строка будет записана и без него.
+        """
+        if self._closing:
+            raise RuntimeError("BetWriter остановлен")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((values, future))
+        return future
+
+    async def insert(self, values: Dict[str, Any]) -> Row:
+        """Вставка одной ставки в ближайшую пачку"""
+        return await self.submit(values)
+
+    async def _run(self) -> None:
+        while True:
+            batch, stop = await self._collect()
+            if batch:
+                await self._flush(batch)
+            if stop:
+                return
+
+    async def _collect(self) -> Tuple[List[_Pending], bool]:
+        item = await self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window
+        while len(batch) < self.max_batch:
+            if self._queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                item = self._queue.get_nowait()
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _flush(self, batch: List[_Pending]) -> None:
+        try:
+            rows = await self._insert([values for values, _ in batch])
+        except (IntegrityError, DataError) as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1], exception=e)
+                return
+            # Ошибка одной строки не должна ронять всю пачку:
+            # повторяем вставку построчно, чтобы каждый получил свой результат
+            for pending in batch:
+                await self._flush([pending])
+            return
+        except Exception as e:
+            # Потеря соединения или перегрузка БД не зависят от строк: построчный
+            # повтор лишь умножил бы нагрузку и задержку, отвечаем ошибкой всем сразу
+            for _, future in batch:
+                _resolve(future, exception=e)
+            return
+
+        for (_, future), row in zip(batch, rows):
+            _resolve(future, result=row)
+
+    async def _insert(self, values: List[Dict[str, Any]]) -> List[Row]:
+        async with self.session_factory() as session:
+            result = await session.execute(
+                insert(BetDB).returning(*BET_RETURNING, sort_by_parameter_order=True),
+                values
+            )
+            rows = result.all()
+            await session.commit()
+            return rows
+
+
+def _resolve(future: asyncio.Future, result: Any = None, exception: Optional[BaseException] = None) -> None:
+    # Клиент мог отключиться и отменить ожидание
+    if future.done():
+        return
+    if exception is not None:
+        future.set_exception(exception)
+    else:
+        future.set_result(result)
@@ -0,0 +1,25 @@
+import httpx
+
+from app.core.config import settings
+
+
+def create_line_provider_client() -> httpx.AsyncClient:
+    """Создание общего пула соединений к Line Provider"""
+    # Клиент ходит только в Line Provider, поэтому max_connections
+    # одновременно является лимитом соединений на хост
+    limits = httpx.Limits(
+        max_connections=settings.LINE_PROVIDER_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.LINE_PROVIDER_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.LINE_PROVIDER_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(
+        settings.LINE_PROVIDER_TIMEOUT,
+        connect=settings.LINE_PROVIDER_CONNECT_TIMEOUT,
+        pool=settings.LINE_PROVIDER_POOL_TIMEOUT
+    )
+    return httpx.AsyncClient(
+        base_url=settings.LINE_PROVIDER_URL,
+        limits=limits,
+        timeout=timeout,
+        http2=settings.LINE_PROVIDER_HTTP2
+    )
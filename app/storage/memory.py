@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from app.core.config import settings
+
+
+@dataclass
+class CacheStats:
+    local_hits: int = 0
+    redis_hits: int = 0
+    misses: int = 0
+    stale_hits: int = 0  # Отданы устаревшие данные из-за недоступности источника
+    stampedes: int = 0  # Запросы, присоединившиеся к уже идущей загрузке
+
+    def as_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+class TTLCache:
+    """Ограниченный по размеру LRU-кэш с временем жизни записей
+
+    Устаревшие записи не удаляются сразу: пока их не вытеснил LRU, они
+    доступны через get_stale() на случай недоступности источника данных.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Получение значения, если оно ещё не устарело"""
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def get_stale(self, key: Hashable) -> Optional[Any]:
+        """Получение значения без учёта срока жизни"""
+        item = self._data.get(key)
+        return item[1] if item is not None else None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Сохранение значения с вытеснением самых старых записей"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Схлопывание одновременных загрузок одного ключа в один вызов"""
+
+    def __init__(self, stats: Optional[CacheStats] = None):
+        self.stats = stats
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._inflight.get(key)
+        if future is not None:
+            if self.stats is not None:
+                self.stats.stampedes += 1
+            # shield: отмена одного ожидающего не должна отменять загрузку для остальных
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(loader())
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+# Кэш событий в памяти процесса, общий для всех запросов воркера
+event_cache_stats = CacheStats()
+event_cache = TTLCache(
+    maxsize=settings.EVENT_LOCAL_CACHE_SIZE,
+    ttl=settings.EVENT_LOCAL_CACHE_TTL
+)
+event_flight = SingleFlight(event_cache_stats)
@@ -0,0 +1,109 @@
+"""Обслуживание помесячных партиций таблицы bets
+
+Используется, только если таблица переведена в партиционированный режим
+миграцией 0003 (BETS_PARTITIONING=true).
+
+    python -m app.storage.partitions ensure
+    python -m app.storage.partitions detach --older-than-months 12
+"""
+import argparse
+import asyncio
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.storage.postgres import engine
+
+PARTITION_PREFIX = "bets_p"
+
+# Функция в базе создаёт недостающие месячные партиции в диапазоне [from_month, to_month]
+ENSURE_PARTITIONS_FUNCTION = """
+CREATE OR REPLACE FUNCTION bets_ensure_partitions(from_month date, to_month date) RETURNS void AS $$
+DECLARE
+    month date := date_trunc('month', from_month)::date;
+BEGIN
+    WHILE month <= to_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF bets FOR VALUES FROM (%L) TO (%L)',
+            'bets_p' || to_char(month, 'YYYYMM'),
+            month,
+            (month + interval '1 month')::date
+        );
+        month := (month + interval '1 month')::date;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    result = await conn.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'bets')"
+    ))
+    return bool(result.scalar())
+
+
+async def ensure_bets_partitions(months_ahead: int = settings.BETS_PARTITIONS_AHEAD) -> None:
+    """Создание партиций на текущий и months_ahead следующих месяцев"""
+    async with engine.begin() as conn:
+        if not await is_partitioned(conn):
+            return
+        await conn.execute(
+            text(
+                "SELECT bets_ensure_partitions("
+                "date_trunc('month', now())::date, "
+                "(date_trunc('month', now()) + make_interval(months => :months))::date)"
+            ),
+            {"months": months_ahead}
+        )
+
+
+async def detach_bets_partitions(older_than_months: int) -> List[str]:
+    """Отсоединение партиций, целиком лежащих старше older_than_months месяцев
+
+    Отсоединённые таблицы остаются в базе, их можно выгрузить и удалить отдельно.
+    """
+    today = date.today()
+    months = today.year * 12 + today.month - 1 - older_than_months
+    cutoff = date(months // 12, months % 12 + 1, 1)
+
+    detached = []
+    async with engine.begin() as conn:
+        result = await conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'bets' AND c.relname LIKE 'bets\\_p%' ORDER BY c.relname"
+        ))
+        for name in result.scalars():
+            suffix = name[len(PARTITION_PREFIX):]
+            if not suffix.isdigit():
+                continue
+            partition_month = date(int(suffix[:4]), int(suffix[4:]), 1)
+            if partition_month < cutoff:
+                await conn.execute(text(f'ALTER TABLE bets DETACH PARTITION "{name}"'))
+                detached.append(name)
+    return detached
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.command == "ensure":
+        await ensure_bets_partitions(args.months_ahead)
+    else:
+        for name in await detach_bets_partitions(args.older_than_months):
+            print(f"detached {name}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Обслуживание партиций таблицы bets")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ensure = subparsers.add_parser("ensure", help="создать партиции на будущие месяцы")
+    ensure.add_argument("--months-ahead", type=int, default=settings.BETS_PARTITIONS_AHEAD)
+    detach = subparsers.add_parser("detach", help="отсоединить старые партиции")
+    detach.add_argument("--older-than-months", type=int, required=True)
+    asyncio.run(main(parser.parse_args()))
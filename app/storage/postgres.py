@@ -1,15 +1,48 @@
+import time
+
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Index, PrimaryKeyConstraint, func
 
 from app.core.config import settings
+from app.core.metrics import CallbackMetric, db_pool_checkout_wait, registry
 from app.models.bets import BetStatus
 
 # Создаем базовый класс для моделей SQLAlchemy
 Base = declarative_base()
 
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время ожидания соединения"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started)
+
+
 # Создаем engine
-engine = create_async_engine(settings.DATABASE_URL, echo=settings.DEBUG)
+engine = create_async_engine(
+    settings.DATABASE_URL,
+    echo=settings.DEBUG,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DATABASE_POOL_SIZE,
+    max_overflow=settings.DATABASE_MAX_OVERFLOW
+)
+
+registry.register(CallbackMetric(
+    "db_pool_connections",
+    "Соединения пула SQLAlchemy",
+    lambda: (
+        (("in_use",), engine.pool.checkedout()),
+        (("idle",), engine.pool.checkedin()),
+        (("size",), engine.pool.size()),
+    ),
+    labelnames=("state",)
+))
 AsyncSessionLocal = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
@@ -17,6 +50,12 @@ AsyncSessionLocal = async_sessionmaker(
 
 class BetDB(Base):
     __tablename__ = "bets"
+    __table_args__ = (
+        # Расчёт ставок по событию
+        Index("ix_bets_event_id_status", "event_id", "status"),
+        # Постраничная выдача ставок
+        Index("ix_bets_created_at_id", "created_at", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     event_id = Column(String, nullable=False)
@@ -24,3 +63,38 @@ class BetDB(Base):
     status = Column(Enum(BetStatus), nullable=False, default=BetStatus.PENDING)
     created_at = Column(DateTime, nullable=False)
     coefficient = Column(Float, nullable=True)
+
+
+class BetArchiveDB(Base):
+    """Рассчитанные ставки, перенесённые из bets воркером архивации (миграция 0005)"""
+    __tablename__ = "bets_archive"
+    __table_args__ = (
+        # Пересчёт агрегатов по часам
+        Index("ix_bets_archive_created_at", "created_at"),
+        # Пересчёт счётчиков риска события
+        Index("ix_bets_archive_event_id", "event_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    event_id = Column(String, nullable=False)
+    amount = Column(Float, nullable=False)
+    status = Column(Enum(BetStatus), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    coefficient = Column(Float, nullable=True)
+    archived_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+class BetRollupDB(Base):
+    """Почасовой агрегат ставок по событию и статусу (миграция 0004)"""
+    __tablename__ = "bet_rollups_hourly"
+    __table_args__ = (
+        PrimaryKeyConstraint("bucket", "event_id", "status"),
+        Index("ix_bet_rollups_hourly_event_id_bucket", "event_id", "bucket"),
+    )
+
+    bucket = Column(DateTime, nullable=False)  # Начало часа по created_at ставок
+    event_id = Column(String, nullable=False)
+    status = Column(Enum(BetStatus), nullable=False)
+    bets = Column(Integer, nullable=False)
+    amount = Column(Float, nullable=False)  # Оборот
+    payout = Column(Float, nullable=False)  # Выплаты по выигравшим ставкам
@@ -1,4 +1,5 @@
 import json
+import time
 from typing import Optional, Dict, List
 
 from redis import asyncio as aioredis
@@ -7,36 +8,101 @@ from app.core.config import settings
 from app.models.events import Event
 
 
+def create_redis_pool() -> aioredis.Redis:
+    """Создание общего пула соединений к Redis"""
+    # Блокирующий пул: при исчерпании запрос ждёт соединение, а не падает сразу
+    pool = aioredis.BlockingConnectionPool.from_url(
+        settings.REDIS_URL,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT
+    )
+    # from_pool передаёт владение пулом клиенту: aclose() закроет и соединения
+    return aioredis.Redis.from_pool(pool)
+
+
 class RedisStorage:
-    def __init__(self):
-        self.redis = aioredis.from_url(settings.REDIS_URL)
+    def __init__(self, redis: Optional[aioredis.Redis] = None):
+        self.redis = redis if redis is not None else aioredis.from_url(settings.REDIS_URL)
         self.EVENT_PREFIX = "event:"
+        self.STALE_EVENT_PREFIX = "event_stale:"
+        self.IDEMPOTENCY_PREFIX = "idempotency:"
+        self.EVENT_CHANGES_CHANNEL = "events:changes"
+        self.SNAPSHOT_KEY = "events_snapshot"
+        self.SNAPSHOT_VERSION_KEY = "events_snapshot:version"
+        self.BETS_SETTLED_CHANNEL = "bets:settled"
+        self.ROLLUPS_DIRTY_KEY = "rollups:dirty"
+        self.WORKERS_KEY = "workers"
+        self.WORKER_PREFIX = "worker:"
+        self.WORKER_METRICS_PREFIX = "worker_metrics:"
 
     async def cache_event(self, event: Event) -> None:
         """Кэширование события"""
-        key = f"{self.EVENT_PREFIX}{event.event_id}"
-        await self.redis.set(
-            key,
-            event.model_dump_json(),
-            ex=settings.EVENT_CACHE_TTL
-        )
+        await self.cache_events([event])
 
     async def get_cached_event(self, event_id: str) -> Optional[Event]:
         """Получение события из кэша"""
         key = f"{self.EVENT_PREFIX}{event_id}"
         data = await self.redis.get(key)
-        print(data)
         if data:
             return Event.model_validate_json(data)
         return None
 
+    async def cache_events(self, events: List[Event]) -> None:
+        """Кэширование нескольких событий за один запрос к Redis"""
+        if not events:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for event in events:
+                data = event.model_dump_json()
+                pipe.set(f"{self.EVENT_PREFIX}{event.event_id}", data, ex=settings.EVENT_CACHE_TTL)
+                # Долгоживущая копия на случай недоступности line provider
+                pipe.set(f"{self.STALE_EVENT_PREFIX}{event.event_id}", data, ex=settings.EVENT_STALE_TTL)
+            await pipe.execute()
+
+    async def get_cached_events(self, event_ids: List[str]) -> Dict[str, Event]:
+        """Получение нескольких событий из кэша одним MGET"""
+        if not event_ids:
+            return {}
+        values = await self.redis.mget([f"{self.EVENT_PREFIX}{event_id}" for event_id in event_ids])
+        return {
+            event_id: Event.model_validate_json(data)
+            for event_id, data in zip(event_ids, values)
+            if data
+        }
+
+    async def invalidate_events(self, event_ids: List[str]) -> None:
+        """Удаление событий и списка событий из кэша"""
+        keys = ["events_list"]
+        for event_id in event_ids:
+            keys.append(f"{self.EVENT_PREFIX}{event_id}")
+            keys.append(f"{self.STALE_EVENT_PREFIX}{event_id}")
+        await self.redis.delete(*keys)
+
+    async def publish_event_changes(self, messages: List[dict]) -> None:
+        """Рассылка изменений событий всем воркерам"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.publish(self.EVENT_CHANGES_CHANNEL, json.dumps(message))
+            await pipe.execute()
+
+    async def get_stale_events(self, event_ids: List[str]) -> Dict[str, Event]:
+        """Получение последних известных версий событий без учёта EVENT_CACHE_TTL"""
+        if not event_ids:
+            return {}
+        values = await self.redis.mget([f"{self.STALE_EVENT_PREFIX}{event_id}" for event_id in event_ids])
+        return {
+            event_id: Event.model_validate_json(data)
+            for event_id, data in zip(event_ids, values)
+            if data
+        }
+
     async def cache_events_list(self, events: List[dict]) -> None:
         """Кэширование списка событий"""
-        await self.redis.set(
-            "events_list",
-            json.dumps(events),
-            ex=settings.EVENT_CACHE_TTL
-        )
+        data = json.dumps(events)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set("events_list", data, ex=settings.EVENT_CACHE_TTL)
+            pipe.set("events_list_stale", data, ex=settings.EVENT_STALE_TTL)
+            await pipe.execute()
 
     async def get_cached_events_list(self) -> Optional[List[dict]]:
         """Получение списка событий из кэша"""
@@ -44,3 +110,132 @@ class RedisStorage:
         if data:
             return json.loads(data)
         return None
+
+    async def reserve_idempotency_key(self, key: str, record: dict, ttl: int) -> bool:
+        """Занять ключ идемпотентности, если его ещё никто не занял"""
+        return bool(await self.redis.set(
+            f"{self.IDEMPOTENCY_PREFIX}{key}",
+            json.dumps(record),
+            ex=ttl,
+            nx=True
+        ))
+
+    async def save_idempotency_record(self, key: str, record: dict, ttl: int) -> None:
+        """Сохранение результата запроса по ключу идемпотентности"""
+        await self.redis.set(f"{self.IDEMPOTENCY_PREFIX}{key}", json.dumps(record), ex=ttl)
+
+    async def get_idempotency_record(self, key: str) -> Optional[dict]:
+        data = await self.redis.get(f"{self.IDEMPOTENCY_PREFIX}{key}")
+        if data:
+            return json.loads(data)
+        return None
+
+    async def release_idempotency_key(self, key: str) -> None:
+        await self.redis.delete(f"{self.IDEMPOTENCY_PREFIX}{key}")
+
+    async def get_stale_events_list(self) -> Optional[List[dict]]:
+        """Получение последнего известного списка событий"""
+        data = await self.redis.get("events_list_stale")
+        if data:
+            return json.loads(data)
+        return None
+
+    async def acquire_leadership(self, name: str, owner: str, ttl: int) -> bool:
+        """Захват или продление роли ведущего воркера для фоновой задачи"""
+        key = f"leader:{name}"
+        if await self.redis.set(key, owner, ex=ttl, nx=True):
+            return True
+        current = await self.redis.get(key)
+        if current is not None and current.decode() == owner:
+            await self.redis.expire(key, ttl)
+            return True
+        return False
+
+    async def next_events_snapshot_version(self) -> int:
+        return await self.redis.incr(self.SNAPSHOT_VERSION_KEY)
+
+    async def publish_events_snapshot(self, version: int, fetched_at: float, events: List[Event]) -> None:
+        """Публикация снимка событий для остальных воркеров"""
+        await self.redis.set(
+            self.SNAPSHOT_KEY,
+            json.dumps({
+                "version": version,
+                "fetched_at": fetched_at,
+                "events": [event.model_dump(mode="json") for event in events]
+            }),
+            ex=settings.EVENT_STALE_TTL
+        )
+
+    async def get_events_snapshot(self) -> Optional[dict]:
+        data = await self.redis.get(self.SNAPSHOT_KEY)
+        if data:
+            return json.loads(data)
+        return None
+
+    async def get_events_snapshot_version(self) -> int:
+        """Версия последнего опубликованного снимка (0, если снимков не было)"""
+        data = await self.redis.get(self.SNAPSHOT_VERSION_KEY)
+        return int(data) if data else 0
+
+    async def publish_event_outcome(self, event_id: str, status: str) -> None:
+        """Постановка исхода события в очередь на расчёт ставок"""
+        await self.redis.xadd(
+            settings.SETTLEMENT_STREAM,
+            {"event_id": event_id, "status": status},
+            maxlen=settings.SETTLEMENT_STREAM_MAXLEN,
+            approximate=True
+        )
+
+    async def publish_bets_settled(self, event_id: str, status: str, bet_ids: List[int]) -> None:
+        """Оповещение воркеров API о рассчитанной пачке ставок"""
+        await self.redis.publish(
+            self.BETS_SETTLED_CHANNEL,
+            json.dumps({"event_id": event_id, "status": status, "bet_ids": bet_ids})
+        )
+
+    async def mark_rollups_dirty(self, buckets: List[str]) -> None:
+        """Часы и события, агрегаты которых нужно пересчитать"""
+        if buckets:
+            await self.redis.sadd(self.ROLLUPS_DIRTY_KEY, *buckets)
+
+    async def pop_dirty_rollups(self, count: int) -> List[str]:
+        members = await self.redis.spop(self.ROLLUPS_DIRTY_KEY, count)
+        return [member.decode() for member in members or []]
+
+    async def record_heartbeat(self, worker_id: str, info: dict, ttl: int) -> None:
+        """Отметка живого воркера; записи молчащих воркеров истекают через ttl"""
+        now = time.time()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"{self.WORKER_PREFIX}{worker_id}", json.dumps(info), ex=ttl)
+            pipe.zadd(self.WORKERS_KEY, {worker_id: now})
+            pipe.zremrangebyscore(self.WORKERS_KEY, "-inf", now - ttl)
+            await pipe.execute()
+
+    async def remove_heartbeat(self, worker_id: str) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(f"{self.WORKER_PREFIX}{worker_id}", f"{self.WORKER_METRICS_PREFIX}{worker_id}")
+            pipe.zrem(self.WORKERS_KEY, worker_id)
+            await pipe.execute()
+
+    async def get_heartbeats(self) -> List[dict]:
+        """Последние отметки живых воркеров"""
+        worker_ids = await self.redis.zrange(self.WORKERS_KEY, 0, -1)
+        if not worker_ids:
+            return []
+        values = await self.redis.mget([f"{self.WORKER_PREFIX}{worker_id.decode()}" for worker_id in worker_ids])
+        return [json.loads(value) for value in values if value is not None]
+
+    async def record_worker_metrics(self, worker_id: str, families: list, ttl: int) -> None:
+        """Снимок метрик процесса для общего /metrics; истекает вместе с отметкой воркера"""
+        await self.redis.set(f"{self.WORKER_METRICS_PREFIX}{worker_id}", json.dumps(families), ex=ttl)
+
+    async def get_worker_metrics(self, exclude: str = "") -> List[list]:
+        """Снимки метрик живых воркеров, кроме exclude"""
+        worker_ids = [
+            worker_id.decode() for worker_id in await self.redis.zrange(self.WORKERS_KEY, 0, -1)
+            if worker_id.decode() != exclude
+        ]
+        if not worker_ids:
+            return []
+        values = await self.redis.mget([f"{self.WORKER_METRICS_PREFIX}{worker_id}" for worker_id in worker_ids])
+        return [json.loads(value) for value in values if value is not None]
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from itertools import count
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.core.metrics import CallbackMetric, registry
+from app.storage.postgres import AsyncSessionLocal, InstrumentedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики в секундах; 0, если всё полученное уже применено
+REPLICATION_LAG_QUERY = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine: AsyncEngine = create_async_engine(url, echo=settings.DEBUG, poolclass=InstrumentedQueuePool)
+        self.sessionmaker = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.healthy = True
+        self.lag: Optional[float] = None
+
+
+class ReplicaRouter:
+    """Выбор реплики для запросов только на чтение
+
+    Реплики перебираются по кругу, недоступные и отставшие больше чем на
+    DATABASE_REPLICA_MAX_LAG секунд пропускаются до следующей проверки.
+    Без здоровых реплик чтение идёт в primary.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(url) for url in urls]
+        self._next = count()
+        self._task: Optional[asyncio.Task] = None
+
+    def sessionmaker(self) -> async_sessionmaker:
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return AsyncSessionLocal
+        return healthy[next(self._next) % len(healthy)].sessionmaker
+
+    async def start(self, interval: float = settings.DATABASE_REPLICA_HEALTH_INTERVAL) -> None:
+        if self.replicas:
+            await self.check()
+            self._task = asyncio.create_task(self._run(interval))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def _run(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check()
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            lag = await asyncio.wait_for(self._lag(replica), timeout=settings.DATABASE_REPLICA_HEALTH_INTERVAL)
+        except Exception as e:
+            if replica.healthy:
+                logger.warning("Реплика %s недоступна: %r", replica.engine.url.host, e)
+            replica.healthy = False
+            return
+
+        replica.lag = float(lag or 0)
+        healthy = replica.lag <= settings.DATABASE_REPLICA_MAX_LAG
+        if healthy != replica.healthy:
+            logger.warning(
+                "Реплика %s %s, отставание %.1f с",
+                replica.engine.url.host,
+                "снова используется" if healthy else "исключена",
+                replica.lag
+            )
+        replica.healthy = healthy
+
+    @staticmethod
+    async def _lag(replica: Replica) -> Optional[float]:
+        async with replica.engine.connect() as conn:
+            return await conn.scalar(REPLICATION_LAG_QUERY)
+
+
+replica_router = ReplicaRouter(settings.DATABASE_REPLICA_URLS)
+
+registry.register(CallbackMetric(
+    "db_replicas",
+    "Реплики PostgreSQL по состоянию",
+    lambda: (
+        (("healthy",), sum(replica.healthy for replica in replica_router.replicas)),
+        (("total",), len(replica_router.replicas)),
+    ),
+    labelnames=("state",)
+))
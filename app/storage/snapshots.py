@@ -0,0 +1,202 @@
+import heapq
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.exceptions import DeadlinePassedError
+from app.models.events import Event
+
+
+@dataclass(frozen=True)
+class EventDiff:
+    added: Tuple[str, ...] = ()
+    changed: Tuple[str, ...] = ()
+    removed: Tuple[str, ...] = ()
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+@dataclass(frozen=True)
+class EventSnapshot:
+    """Неизменяемый снимок событий line provider"""
+
+    version: int
+    events: Mapping[str, Event] = field(default_factory=lambda: MappingProxyType({}))
+    fetched_at: float = 0.0  # Время получения от line provider (unix time)
+
+    @classmethod
+    def build(cls, version: int, events: Iterable[Event], fetched_at: float) -> "EventSnapshot":
+        return cls(
+            version=version,
+            events=MappingProxyType({event.event_id: event for event in events}),
+            fetched_at=fetched_at
+        )
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+def diff_events(old: Mapping[str, Event], new: Mapping[str, Event]) -> EventDiff:
+    """Разница между двумя наборами событий"""
+    return EventDiff(
+        added=tuple(event_id for event_id in new if event_id not in old),
+        changed=tuple(event_id for event_id, event in new.items() if event_id in old and old[event_id] != event),
+        removed=tuple(event_id for event_id in old if event_id not in new)
+    )
+
+
+def deadline_timestamp(event: Event) -> float:
+    """Дедлайн события в unix time; наивное время считается локальным, как datetime.now()"""
+    return datetime.fromisoformat(event.deadline).timestamp()
+
+
+class OpenEventsIndex:
+    """События, на которые ещё принимаются ставки, упорядоченные по дедлайну
+
+    Дедлайн разбирается один раз при попадании события в индекс. Куча
+    хранит пары (дедлайн, id); записи изменённых событий не удаляются из
+    кучи сразу, а пропускаются при извлечении, если дедлайн уже другой.
+    """
+
+    def __init__(self):
+        self._open: Dict[str, Tuple[float, Event]] = {}
+        self._closed: Set[str] = set()
+        self._heap: List[Tuple[float, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._open)
+
+    def rebuild(self, events: Iterable[Event]) -> None:
+        self._open.clear()
+        self._closed.clear()
+        self._heap = []
+        self.update(events)
+
+    def update(self, events: Iterable[Event], now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        for event in events:
+            try:
+                deadline = deadline_timestamp(event)
+            except ValueError:
+                # Неразборчивый дедлайн: событие не попадает в индекс, и поиск
+                # по нему уходит в EventService, как для неизвестного
+                self.remove([event.event_id])
+                continue
+            if deadline <= now:
+                self._open.pop(event.event_id, None)
+                self._closed.add(event.event_id)
+                continue
+            self._closed.discard(event.event_id)
+            current = self._open.get(event.event_id)
+            self._open[event.event_id] = (deadline, event)
+            if current is None or current[0] != deadline:
+                heapq.heappush(self._heap, (deadline, event.event_id))
+        # Устаревшие записи кучи вычищаются, когда их становится больше живых
+        if len(self._heap) > 2 * len(self._open) + 64:
+            self._heap = [(deadline, event_id) for event_id, (deadline, _) in self._open.items()]
+            heapq.heapify(self._heap)
+
+    def remove(self, event_ids: Iterable[str]) -> None:
+        for event_id in event_ids:
+            self._open.pop(event_id, None)
+            self._closed.discard(event_id)
+
+    def evict(self, now: Optional[float] = None) -> None:
+        """Перенос событий с наступившим дедлайном в закрытые"""
+        now = time.time() if now is None else now
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            deadline, event_id = heapq.heappop(heap)
+            current = self._open.get(event_id)
+            if current is not None and current[0] == deadline:
+                del self._open[event_id]
+                self._closed.add(event_id)
+
+    def get(self, event_id: str, now: Optional[float] = None) -> Optional[Event]:
+        """Открытое событие; DeadlinePassedError для закрытого, None для неизвестного"""
+        self.evict(now)
+        item = self._open.get(event_id)
+        if item is not None:
+            return item[1]
+        if event_id in self._closed:
+            raise DeadlinePassedError(event_id)
+        return None
+
+    def open_events(self, now: Optional[float] = None) -> List[Event]:
+        """Открытые события от ближайшего дедлайна к дальнему"""
+        self.evict(now)
+        return [event for _, event in sorted(self._open.values(), key=lambda item: item[0])]
+
+
+class EventSnapshotStore:
+    """Текущий снимок событий процесса, заменяется целиком"""
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self._snapshot: Optional[EventSnapshot] = None
+        self.open_events = OpenEventsIndex()
+
+    @property
+    def snapshot(self) -> Optional[EventSnapshot]:
+        return self._snapshot
+
+    def fresh(self) -> Optional[EventSnapshot]:
+        """Снимок, если он не старше max_age, иначе None"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age > self.max_age:
+            return None
+        return snapshot
+
+    def get_open_event(self, event_id: str) -> Optional[Event]:
+        """Проверка события по индексу открытых без обращения к line provider
+
+        При свежем снимке возвращает открытое событие, а для закрытого бросает
+        DeadlinePassedError. None означает, что индекс решить не может: снимок
+        устарел, событие появилось у line provider после опроса или его дедлайн
+        не разобрался. Такое событие проверяется обычным путём через EventService.
+        """
+        if self.fresh() is None:
+            return None
+        return self.open_events.get(event_id)
+
+    def patch(self, updated: Iterable[Event] = (), removed: Iterable[str] = ()) -> None:
+        """Точечное обновление текущего снимка без смены версии"""
+        current = self._snapshot
+        if current is None:
+            return
+        updated, removed = list(updated), list(removed)
+        events = dict(current.events)
+        for event in updated:
+            events[event.event_id] = event
+        for event_id in removed:
+            events.pop(event_id, None)
+        self.open_events.update(updated)
+        self.open_events.remove(removed)
+        self._snapshot = EventSnapshot(
+            version=current.version,
+            events=MappingProxyType(events),
+            fetched_at=current.fetched_at
+        )
+
+    def replace(self, snapshot: EventSnapshot) -> EventDiff:
+        """Установка более нового снимка, возвращает разницу с предыдущим"""
+        current = self._snapshot
+        if current is not None and snapshot.version < current.version:
+            return EventDiff()
+        self._snapshot = snapshot
+        if current is None:
+            self.open_events.rebuild(snapshot.events.values())
+            return diff_events({}, snapshot.events)
+
+        diff = diff_events(current.events, snapshot.events)
+        self.open_events.update(snapshot.events[event_id] for event_id in diff.added + diff.changed)
+        self.open_events.remove(diff.removed)
+        return diff
+
+
+event_snapshots = EventSnapshotStore(max_age=settings.EVENT_SNAPSHOT_MAX_AGE)
@@ -0,0 +1,80 @@
+"""Воркер архивации рассчитанных ставок
+
+Раз в ARCHIVE_INTERVAL секунд переносит выигравшие и проигравшие ставки
+старше ARCHIVE_AFTER_DAYS дней из bets в bets_archive пачками по
+ARCHIVE_BATCH_SIZE:
+
+    python -m app.workers.archiver                          # постоянная работа
+    python -m app.workers.archiver --once                   # один проход
+    python -m app.workers.archiver --once --max-batches 10  # ограниченный проход
+
+Каждая пачка фиксируется отдельно, остановленный проход продолжается
+с того же места при следующем запуске.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+from datetime import timedelta
+from typing import Optional
+
+from app.core.config import settings
+from app.services.archive import BetArchiver
+from app.storage.postgres import engine
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveWorker:
+    def __init__(
+            self,
+            older_than: timedelta = timedelta(days=settings.ARCHIVE_AFTER_DAYS),
+            interval: float = settings.ARCHIVE_INTERVAL
+    ):
+        self.archiver = BetArchiver()
+        self.older_than = older_than
+        self.interval = interval
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run_once(self, max_batches: Optional[int] = None) -> int:
+        archived = await self.archiver.archive(self.older_than, max_batches)
+        logger.info("Перенесено в архив ставок: %s", archived)
+        return archived
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("Не удалось перенести ставки в архив")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def main(args: argparse.Namespace) -> None:
+    worker = ArchiveWorker(older_than=timedelta(days=args.older_than_days))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        if args.once:
+            await worker.run_once(args.max_batches)
+        else:
+            await worker.run()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="один проход и выход")
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--max-batches", type=int, default=None, help="не больше N пачек за проход")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(args))
@@ -0,0 +1,84 @@
+"""Воркер почасовых агрегатов ставок
+
+Раз в ROLLUP_INTERVAL секунд пересчитывает таблицу bet_rollups_hourly,
+из которой отвечают отчёты /reports:
+
+    python -m app.workers.rollups             # постоянная работа
+    python -m app.workers.rollups --once      # один проход
+    python -m app.workers.rollups --backfill  # построить агрегаты по всей истории
+
+Можно запускать несколько экземпляров: проход выполняет только ведущий,
+выбранный через Redis.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from redis import asyncio as aioredis
+
+from app.core.config import settings
+from app.services.heartbeat import worker_id
+from app.services.rollups import RollupAggregator
+from app.storage.postgres import engine
+from app.storage.redis import RedisStorage, create_redis_pool
+
+logger = logging.getLogger(__name__)
+
+
+class RollupWorker:
+    def __init__(self, redis: aioredis.Redis, interval: float = settings.ROLLUP_INTERVAL):
+        self.storage = RedisStorage(redis)
+        self.aggregator = RollupAggregator(self.storage)
+        self.interval = interval
+        self.worker_id = worker_id()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                leader = await self.storage.acquire_leadership(
+                    "rollups",
+                    self.worker_id,
+                    ttl=max(int(self.interval * 3), 1)
+                )
+                if leader:
+                    refreshed = await self.aggregator.run_once()
+                    logger.info("Пересчитано часов агрегатов: %s", refreshed)
+            except Exception:
+                logger.exception("Не удалось пересчитать агрегаты ставок")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def main(once: bool = False, backfill: bool = False) -> None:
+    redis = create_redis_pool()
+    worker = RollupWorker(redis)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        if backfill:
+            windows = await worker.aggregator.backfill()
+            logger.info("Агрегаты построены, окон: %s", windows)
+        elif once:
+            await worker.aggregator.run_once()
+        else:
+            await worker.run()
+    finally:
+        await redis.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--once", action="store_true", help="один проход и выход")
+    parser.add_argument("--backfill", action="store_true", help="пересчитать всю историю ставок")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(once=args.once, backfill=args.backfill))
@@ -0,0 +1,214 @@
+"""Воркер расчёта ставок
+
+Читает исходы событий из Redis Stream SETTLEMENT_STREAM в группе
+SETTLEMENT_GROUP и рассчитывает ставки вне процессов API:
+
+    python -m app.workers.settlement
+
+Сообщение подтверждается (XACK) только после фиксации расчёта. Неудачные
+сообщения остаются в списке ожидающих и через SETTLEMENT_CLAIM_IDLE_MS
+забираются повторно, после SETTLEMENT_MAX_DELIVERIES попыток переносятся
+в SETTLEMENT_DEAD_LETTER_STREAM.
+"""
+import asyncio
+import logging
+import signal
+from typing import Dict, Set
+
+from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
+
+from app.core.config import settings
+from app.core.metrics import start_metrics_server
+from app.models.events import EventStatus
+from app.services.bets import BetService
+from app.services.heartbeat import worker_id
+from app.services.exposure import ExposureService
+from app.storage.postgres import AsyncSessionLocal, engine
+from app.storage.redis import RedisStorage, create_redis_pool
+
+logger = logging.getLogger(__name__)
+
+
+class SettlementWorker:
+    # Пауза после ошибки Redis растёт от MIN до MAX, сек
+    MIN_BACKOFF = 0.5
+    MAX_BACKOFF = 30.0
+
+    def __init__(self, redis: aioredis.Redis, concurrency: int = settings.SETTLEMENT_CONCURRENCY):
+        self.redis = redis
+        self.consumer = worker_id()
+        self.concurrency = concurrency
+        self._slots = asyncio.Semaphore(concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self._in_flight: Set[bytes] = set()
+        self._group_ready = False
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        keepalive = asyncio.create_task(self._keep_in_flight_claimed())
+        backoff = self.MIN_BACKOFF
+        try:
+            while not self._stopping.is_set():
+                try:
+                    if not self._group_ready:
+                        await self._ensure_group()
+                        self._group_ready = True
+                    await self._dispatch(await self._claim_stale() or await self._read_new())
+                    backoff = self.MIN_BACKOFF
+                except Exception:
+                    # После перезапуска Redis группы может не быть
+                    self._group_ready = False
+                    # Сбой Redis не должен останавливать расчёт навсегда
+                    logger.exception("Не удалось прочитать исходы событий, повтор через %.1f с", backoff)
+                    await self._sleep(backoff)
+                    backoff = min(backoff * 2, self.MAX_BACKOFF)
+        finally:
+            keepalive.cancel()
+            # Дожидаемся расчётов, которые уже начались
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _dispatch(self, messages) -> None:
+        for message_id, fields in messages:
+            if message_id in self._in_flight:
+                # Сообщение уже рассчитывается этим воркером
+                continue
+            # Ждём свободный слот, чтобы не набирать больше concurrency сообщений
+            await self._slots.acquire()
+            self._in_flight.add(message_id)
+            task = asyncio.create_task(self._process(message_id, fields))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _keep_in_flight_claimed(self) -> None:
+        """Сброс времени простоя рассчитываемых сообщений
+
+        Расчёт крупного события может идти дольше SETTLEMENT_CLAIM_IDLE_MS.
+        Без сброса XAUTOCLAIM другого воркера забрал бы сообщение и рассчитал
+        событие параллельно, повторив рассылку и пометки агрегатов.
+        """
+        interval = settings.SETTLEMENT_CLAIM_IDLE_MS / 1000 / 3
+        while True:
+            await asyncio.sleep(interval)
+            if not self._in_flight:
+                continue
+            try:
+                await self.redis.xclaim(
+                    settings.SETTLEMENT_STREAM,
+                    settings.SETTLEMENT_GROUP,
+                    self.consumer,
+                    min_idle_time=0,
+                    message_ids=list(self._in_flight),
+                    justid=True
+                )
+            except Exception:
+                logger.exception("Не удалось продлить сообщения в обработке")
+
+    async def _sleep(self, delay: float) -> None:
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _ensure_group(self) -> None:
+        try:
+            await self.redis.xgroup_create(
+                settings.SETTLEMENT_STREAM,
+                settings.SETTLEMENT_GROUP,
+                id="0",
+                mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _claim_stale(self):
+        """Повторная выдача сообщений, которые давно не подтверждены"""
+        response = await self.redis.xautoclaim(
+            settings.SETTLEMENT_STREAM,
+            settings.SETTLEMENT_GROUP,
+            self.consumer,
+            min_idle_time=settings.SETTLEMENT_CLAIM_IDLE_MS,
+            count=self.concurrency
+        )
+        # Удалённые из потока записи приходят без полей
+        return [(message_id, fields) for message_id, fields in response[1] if fields]
+
+    async def _read_new(self):
+        response = await self.redis.xreadgroup(
+            settings.SETTLEMENT_GROUP,
+            self.consumer,
+            {settings.SETTLEMENT_STREAM: ">"},
+            count=self.concurrency,
+            block=1000
+        )
+        return response[0][1] if response else []
+
+    async def _process(self, message_id: bytes, fields: Dict[bytes, bytes]) -> None:
+        try:
+            event_id = fields[b"event_id"].decode()
+            event_status = EventStatus(fields[b"status"].decode())
+            async with AsyncSessionLocal() as session:
+                storage = RedisStorage(self.redis)
+                service = BetService(session, None, exposure=ExposureService(storage, session), storage=storage)
+                settled = await service.update_bet_status(event_id, event_status)
+            await self.redis.xack(settings.SETTLEMENT_STREAM, settings.SETTLEMENT_GROUP, message_id)
+            logger.info("Событие %s (%s): рассчитано ставок %s", event_id, event_status.value, settled)
+        except Exception as e:
+            logger.exception("Не удалось рассчитать сообщение %s", message_id)
+            try:
+                await self._retry_or_dead_letter(message_id, fields, e)
+            except Exception:
+                # Сообщение остаётся неподтверждённым и будет забрано повторно
+                logger.exception("Не удалось обработать ошибку расчёта сообщения %s", message_id)
+        finally:
+            self._in_flight.discard(message_id)
+            self._slots.release()
+
+    async def _retry_or_dead_letter(self, message_id: bytes, fields: Dict[bytes, bytes], error: Exception) -> None:
+        pending = await self.redis.xpending_range(
+            settings.SETTLEMENT_STREAM,
+            settings.SETTLEMENT_GROUP,
+            min=message_id,
+            max=message_id,
+            count=1
+        )
+        deliveries = pending[0]["times_delivered"] if pending else 0
+        if deliveries < settings.SETTLEMENT_MAX_DELIVERIES:
+            # Сообщение остаётся неподтверждённым и будет забрано повторно
+            return
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                settings.SETTLEMENT_DEAD_LETTER_STREAM,
+                {**fields, b"message_id": message_id, b"error": str(error)[:1000]}
+            )
+            pipe.xack(settings.SETTLEMENT_STREAM, settings.SETTLEMENT_GROUP, message_id)
+            await pipe.execute()
+
+
+async def main() -> None:
+    redis = create_redis_pool()
+    worker = SettlementWorker(redis)
+    metrics_server = None
+    if settings.SETTLEMENT_METRICS_PORT:
+        metrics_server = await start_metrics_server(settings.SETTLEMENT_METRICS_PORT)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await redis.aclose()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""Локальный line provider для нагрузочных тестов
+
+ASGI-приложение с тем же форматом ответов, что у настоящего line provider,
+и настраиваемыми задержкой, долей ошибок и числом событий:
+
+    python -m benchmarks.fake_line_provider --port 8000 --events 1000 --latency-ms 20 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.models.common import StatusEnum
+from app.models.events import EventStatus
+
+
+def generate_events(count: int, seed: int = 0) -> List[Dict]:
+    """Набор открытых событий с дедлайном через сутки"""
+    rng = random.Random(seed)
+    deadline = (datetime.now() + timedelta(days=1)).isoformat()
+    return [
+        {
+            "event_id": f"event_{i}",
+            "coefficient": round(rng.uniform(1.1, 5.0), 2),
+            "deadline": deadline,
+            "status": EventStatus.NEW.value
+        }
+        for i in range(count)
+    ]
+
+
+def create_app(
+        events: int = 100,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = 0
+) -> FastAPI:
+    """Фейковый line provider
+
+    latency_ms и jitter_ms задают задержку ответа, error_rate — долю ответов 503.
+    """
+    app = FastAPI(title="Fake Line Provider")
+    rng = random.Random(seed)
+    app.state.events = {event["event_id"]: event for event in generate_events(events, seed or 0)}
+
+    async def delay() -> Optional[JSONResponse]:
+        pause = latency_ms + (rng.uniform(-jitter_ms, jitter_ms) if jitter_ms else 0.0)
+        if pause > 0:
+            await asyncio.sleep(pause / 1000)
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse({"status": StatusEnum.ERROR, "message": "injected failure"}, status_code=503)
+        return None
+
+    @app.get("/events")
+    async def get_events():
+        error = await delay()
+        if error is not None:
+            return error
+        return {"status": StatusEnum.SUCCESS, "data": {"events": list(app.state.events.values())}}
+
+    @app.get("/events/{event_id}")
+    async def get_event(event_id: str):
+        error = await delay()
+        if error is not None:
+            return error
+        event = app.state.events.get(event_id)
+        if event is None:
+            return JSONResponse({"status": StatusEnum.ERROR, "message": "Event not found"}, status_code=404)
+        return {"status": StatusEnum.SUCCESS, "data": event}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.events, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
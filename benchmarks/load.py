@@ -0,0 +1,224 @@
+"""Нагрузочный тест POST /bet, GET /bets и GET /events
+
+По умолчанию сервис запускается в этом же процессе (нужны PostgreSQL и Redis
+из настроек), а line provider подменяется локальным фейком
+benchmarks.fake_line_provider на --fake-port:
+
+    python -m benchmarks.load --concurrency 50 --duration 10 --output results.json
+
+С --base-url нагружается уже запущенный сервис, фейк при этом не поднимается
+(его можно запустить отдельно командой python -m benchmarks.fake_line_provider).
+
+Результат — JSON с пропускной способностью, p50/p95/p99 и выделениями памяти
+(tracemalloc) по каждому сценарию. tracemalloc сам замедляет процесс, поэтому
+пропускную способность сравнивайте только между прогонами с одинаковым флагом.
+"""
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+import httpx
+
+SCENARIOS = ("events", "bet", "bets")
+
+Request = Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Перцентиль по методу ближайшего ранга, values должны быть отсортированы"""
+    if not values:
+        return 0.0
+    rank = max(1, min(len(values), math.ceil(q / 100 * len(values))))
+    return values[rank - 1]
+
+
+def summarize(latencies: List[float], statuses: Dict[str, int], elapsed: float) -> Dict:
+    latencies.sort()
+    total = sum(statuses.values())
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": total,
+        "errors": errors,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+def make_request(scenario: str, events: int, rng: random.Random) -> Request:
+    if scenario == "events":
+        return lambda client: client.get("/events")
+    if scenario == "bets":
+        return lambda client: client.get("/bets", params={"limit": 100})
+    if scenario == "bet":
+        return lambda client: client.post(
+            "/bet",
+            json={"event_id": f"event_{rng.randrange(events)}", "amount": 10.0}
+        )
+    raise ValueError(f"Неизвестный сценарий: {scenario}")
+
+
+async def run_scenario(
+        client: httpx.AsyncClient,
+        request: Request,
+        concurrency: int,
+        duration: float,
+        warmup: float,
+        trace_allocations: bool
+) -> Dict:
+    """concurrency воркеров шлют запросы без пауз в течение duration секунд"""
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    recording = False
+
+    async def worker(deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                status = str((await request(client)).status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if recording:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    if warmup > 0:
+        deadline = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(deadline) for _ in range(concurrency)))
+
+    recording = True
+    if trace_allocations:
+        tracemalloc.start()
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(worker(deadline) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = summarize(latencies, statuses, elapsed)
+    if trace_allocations:
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["allocations"] = {
+            "retained_bytes": current,
+            "peak_bytes": peak,
+            "peak_bytes_per_request": round(peak / result["requests"], 1) if result["requests"] else 0.0,
+        }
+    return result
+
+
+async def start_fake_line_provider(stack: AsyncExitStack, args: argparse.Namespace) -> None:
+    """Фейковый line provider на --fake-port в фоне текущего event loop"""
+    import uvicorn
+    from benchmarks.fake_line_provider import create_app
+
+    app = create_app(args.fake_events, args.fake_latency_ms, args.fake_jitter_ms, args.fake_error_rate, args.seed)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.fake_port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        if task.done():
+            task.result()
+        await asyncio.sleep(0.01)
+
+    async def shutdown() -> None:
+        server.should_exit = True
+        await task
+
+    stack.push_async_callback(shutdown)
+
+
+async def open_target(stack: AsyncExitStack, args: argparse.Namespace) -> httpx.AsyncClient:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.base_url:
+        return await stack.enter_async_context(httpx.AsyncClient(base_url=args.base_url, limits=limits))
+
+    await start_fake_line_provider(stack, args)
+
+    from app.core.config import settings
+    settings.LINE_PROVIDER_URL = f"http://127.0.0.1:{args.fake_port}"
+    from app.main import app
+
+    await stack.enter_async_context(app.router.lifespan_context(app))
+    transport = httpx.ASGITransport(app=app)
+    return await stack.enter_async_context(httpx.AsyncClient(transport=transport, base_url="http://bench"))
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    rng = random.Random(args.seed)
+    results = {}
+    async with AsyncExitStack() as stack:
+        client = await open_target(stack, args)
+        for scenario in args.scenarios:
+            results[scenario] = await run_scenario(
+                client,
+                make_request(scenario, args.fake_events, rng),
+                args.concurrency,
+                args.duration,
+                args.warmup,
+                args.tracemalloc
+            )
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "target": args.base_url or "in-process",
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "tracemalloc": args.tracemalloc,
+            "fake_line_provider": None if args.base_url else {
+                "events": args.fake_events,
+                "latency_ms": args.fake_latency_ms,
+                "jitter_ms": args.fake_jitter_ms,
+                "error_rate": args.fake_error_rate,
+            },
+        },
+        "results": results,
+    }
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="Адрес запущенного сервиса; по умолчанию сервис поднимается в процессе")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="Длительность замера каждого сценария, сек")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Прогрев перед замером, сек")
+    parser.add_argument("--no-tracemalloc", dest="tracemalloc", action="store_false")
+    parser.add_argument("--fake-port", type=int, default=18000)
+    parser.add_argument("--fake-events", type=int, default=100)
+    parser.add_argument("--fake-latency-ms", type=float, default=5.0)
+    parser.add_argument("--fake-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Файл для JSON-результата; по умолчанию stdout")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    report = json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main()
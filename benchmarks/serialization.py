@@ -0,0 +1,114 @@
+"""CPU на сериализацию страницы ставок: прежний путь против BetRecord + orjson
+
+Запуск (БД не нужна, строки генерируются в памяти):
+
+    python -m benchmarks.serialization --bets 10000 --repeat 20
+
+Прежний путь: Bet(...) на каждую строку, BetsListResponse(...) и повторная
+валидация response_model в FastAPI. Новый: BetRecord.from_row и ORJSONResponse.
+Оба эндпоинта вызываются через ASGI, поэтому в замер входит и работа FastAPI.
+Загрузка строк из PostgreSQL в замер не входит.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from app.models.bets import Bet, BetRecord, BetStatus
+from app.models.common import StatusEnum
+from app.schemas.bets import BetsListResponse
+
+# Та же форма, что у строк select(*BET_RETURNING)
+BetRow = namedtuple("BetRow", "id event_id amount status created_at coefficient")
+
+
+def generate_rows(count: int) -> List[BetRow]:
+    started = datetime.now()
+    return [
+        BetRow(i, f"event_{i % 100}", 100.0 + i, BetStatus.PENDING, started - timedelta(seconds=i), 1.85)
+        for i in range(count)
+    ]
+
+
+def create_app(rows: List[BetRow]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/legacy", response_model=BetsListResponse)
+    async def legacy():
+        bets = [
+            Bet(
+                id=bet.id,
+                event_id=bet.event_id,
+                amount=bet.amount,
+                status=bet.status,
+                created_at=bet.created_at,
+                coefficient=bet.coefficient
+            )
+            for bet in rows
+        ]
+        return BetsListResponse(
+            status=StatusEnum.SUCCESS,
+            message="Список ставок получен",
+            data={"bets": bets, "next_cursor": None}
+        )
+
+    @app.get("/fast", response_model=BetsListResponse)
+    async def fast():
+        bets = [BetRecord.from_row(row) for row in rows]
+        return ORJSONResponse({
+            "status": StatusEnum.SUCCESS,
+            "message": "Список ставок получен",
+            "data": {"bets": bets, "next_cursor": None}
+        })
+
+    return app
+
+
+async def measure(client: httpx.AsyncClient, path: str, repeat: int) -> Dict[str, float]:
+    await client.get(path)  # прогрев
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.process_time()
+        response = await client.get(path)
+        timings.append(time.process_time() - started)
+        response.raise_for_status()
+    timings.sort()
+    return {
+        "cpu_ms_median": round(timings[len(timings) // 2] * 1000, 2),
+        "cpu_ms_min": round(timings[0] * 1000, 2),
+        "response_bytes": len(response.content),
+    }
+
+
+async def run(bets: int, repeat: int) -> Dict:
+    app = create_app(generate_rows(bets))
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        legacy = await measure(client, "/legacy", repeat)
+        fast = await measure(client, "/fast", repeat)
+        # Ответы должны совпадать по содержимому
+        assert (await client.get("/legacy")).json() == (await client.get("/fast")).json()
+    return {
+        "bets": bets,
+        "legacy": legacy,
+        "fast": fast,
+        "speedup": round(legacy["cpu_ms_median"] / fast["cpu_ms_median"], 2),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bets", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.bets, args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Сравнение пакетного расчёта ставок с построчным ORM-расчётом
+
+Запуск (нужен PostgreSQL из DATABASE_URL, таблица bets создаётся при необходимости):
+
+    python -m benchmarks.settlement --sizes 10000 100000 1000000 --output settlement.json --markdown
+
+Замеры зависят от сервера БД, поэтому в отчёт пишется версия PostgreSQL и
+окружение запуска; таблица из --markdown вставляется в README вместе с ними.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, text
+
+from app.models.bets import Bet, BetStatus
+from app.models.events import EventStatus
+from app.services.bets import BetService
+from app.storage.postgres import AsyncSessionLocal, Base, BetDB, engine
+
+
+async def seed(event_id: str, rows: int) -> None:
+    """Вставка rows ожидающих ставок одним запросом на стороне сервера"""
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO bets (event_id, amount, status, created_at, coefficient) "
+                "SELECT :event_id, 100.0, 'PENDING', now(), 1.85 FROM generate_series(1, :rows)"
+            ),
+            {"event_id": event_id, "rows": rows}
+        )
+
+
+async def cleanup(event_id: str) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM bets WHERE event_id = :event_id"), {"event_id": event_id})
+
+
+async def legacy_update_bet_status(event_id: str, event_status: EventStatus) -> List[Bet]:
+    """Прежняя реализация: загрузка всех строк в ORM и изменение по одной"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(BetDB).where(BetDB.event_id == event_id))
+        bets_db = result.scalars().all()
+
+        updated_bets = []
+        for bet_db in bets_db:
+            if event_status == EventStatus.FIRST_TEAM_WON:
+                bet_db.status = BetStatus.WON
+            elif event_status == EventStatus.SECOND_TEAM_WON:
+                bet_db.status = BetStatus.LOST
+
+            updated_bets.append(Bet(
+                id=bet_db.id,
+                event_id=bet_db.event_id,
+                amount=bet_db.amount,
+                status=bet_db.status,
+                created_at=bet_db.created_at,
+                coefficient=bet_db.coefficient
+            ))
+
+        await session.commit()
+        return updated_bets
+
+
+async def batched_update_bet_status(event_id: str, event_status: EventStatus) -> int:
+    async with AsyncSessionLocal() as session:
+        return await BetService(session, None).update_bet_status(event_id, event_status)
+
+
+async def measure(name: str, rows: int, func) -> dict:
+    event_id = f"bench-{name}-{rows}"
+    await cleanup(event_id)
+    await seed(event_id, rows)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    await func(event_id, EventStatus.FIRST_TEAM_WON)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    await cleanup(event_id)
+    return {
+        "path": name,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed),
+        "peak_memory_mb": round(peak / 2 ** 20, 1),
+    }
+
+
+def format_table(results: List[Dict]) -> str:
+    """Markdown-таблица замеров: строки по размеру, колонки по способу расчёта"""
+    lines = [
+        "| Ставок | Способ | Время, с | Ставок/с | Пик памяти, МБ |",
+        "|---:|---|---:|---:|---:|",
+    ]
+    for result in sorted(results, key=lambda result: (result["rows"], result["path"] != "legacy")):
+        lines.append(
+            f"| {result['rows']:,} | {result['path']} | {result['seconds']} "
+            f"| {result['rows_per_second']:,} | {result['peak_memory_mb']} |"
+        )
+    return "\n".join(lines)
+
+
+async def main(sizes: List[int], skip_legacy_above: int, output: Optional[str] = None, markdown: bool = False) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        server_version = (await conn.execute(text("SHOW server_version"))).scalar()
+
+    results = []
+    for rows in sizes:
+        paths = [("legacy", legacy_update_bet_status)] if rows <= skip_legacy_above else []
+        paths.append(("batched", batched_update_bet_status))
+        for name, func in paths:
+            result = await measure(name, rows, func)
+            results.append(result)
+            print(json.dumps(result), flush=True)
+
+    await engine.dispose()
+
+    if output:
+        report = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "postgres": server_version,
+                "host": platform.node(),
+            },
+            "results": results,
+        }
+        with open(output, "w") as f:
+            f.write(json.dumps(report, ensure_ascii=False, indent=2) + "\n")
+    if markdown:
+        sys.stdout.write(f"\nPostgreSQL {server_version}, Python {platform.python_version()}\n\n")
+        sys.stdout.write(format_table(results) + "\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument(
+        "--skip-legacy-above",
+        type=int,
+        default=1_000_000,
+        help="не запускать построчный расчёт на таблицах больше этого размера"
+    )
+    parser.add_argument("--output", help="Файл для JSON-отчёта с окружением и замерами")
+    parser.add_argument("--markdown", action="store_true", help="в конце вывести таблицу для README")
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.skip_legacy_above, args.output, args.markdown))
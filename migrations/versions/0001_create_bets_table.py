@@ -0,0 +1,34 @@
+"""create bets table
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-11-10 12:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bets",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_id", sa.String(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDING", "WON", "LOST", name="betstatus"),
+            nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("coefficient", sa.Float(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("bets")
+    sa.Enum(name="betstatus").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,39 @@
+"""add bets indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2024-11-10 12:10:00
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует вставку ставок, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        # Расчёт ставок: WHERE event_id = ... AND status = 'PENDING'
+        op.create_index(
+            "ix_bets_event_id_status",
+            "bets",
+            ["event_id", "status"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        # Постраничная выдача: ORDER BY created_at DESC, id DESC
+        op.create_index(
+            "ix_bets_created_at_id",
+            "bets",
+            ["created_at", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_bets_created_at_id", "bets", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_bets_event_id_status", "bets", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,96 @@
+"""partition bets by month
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2024-11-10 12:20:00
+
+Выполняется только при BETS_PARTITIONING=true: таблица bets пересоздаётся
+как партиционированная по created_at, данные копируются в новые партиции.
+Первичный ключ становится (id, created_at), так как PostgreSQL требует
+включать ключ партиционирования во все уникальные индексы.
+"""
+from alembic import op
+
+from app.core.config import settings
+from app.storage.partitions import ENSURE_PARTITIONS_FUNCTION
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def _is_partitioned() -> bool:
+    if op.get_context().as_sql:
+        return False
+    return bool(op.get_bind().exec_driver_sql(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table pt "
+        "JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = 'bets')"
+    ).scalar())
+
+
+def upgrade() -> None:
+    if not settings.BETS_PARTITIONING or _is_partitioned():
+        return
+
+    op.execute("ALTER TABLE bets RENAME TO bets_unpartitioned")
+    op.execute("ALTER TABLE bets_unpartitioned RENAME CONSTRAINT bets_pkey TO bets_unpartitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_bets_event_id_status")
+    op.execute("DROP INDEX IF EXISTS ix_bets_created_at_id")
+    op.execute("ALTER SEQUENCE bets_id_seq OWNED BY NONE")
+
+    op.execute("""
+        CREATE TABLE bets (
+            id integer NOT NULL DEFAULT nextval('bets_id_seq'),
+            event_id varchar NOT NULL,
+            amount double precision NOT NULL,
+            status betstatus NOT NULL,
+            created_at timestamp without time zone NOT NULL,
+            coefficient double precision,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE bets_id_seq OWNED BY bets.id")
+    op.execute("CREATE INDEX ix_bets_event_id_status ON bets (event_id, status)")
+    op.execute("CREATE INDEX ix_bets_created_at_id ON bets (created_at, id)")
+
+    # Партиции на всю историю и на BETS_PARTITIONS_AHEAD месяцев вперёд,
+    # DEFAULT-партиция ловит строки за пределами созданных диапазонов
+    op.execute(ENSURE_PARTITIONS_FUNCTION)
+    op.execute(f"""
+        SELECT bets_ensure_partitions(
+            COALESCE((SELECT min(created_at) FROM bets_unpartitioned), now())::date,
+            (date_trunc('month', now()) + interval '{int(settings.BETS_PARTITIONS_AHEAD)} months')::date
+        )
+    """)
+    op.execute("CREATE TABLE bets_default PARTITION OF bets DEFAULT")
+
+    op.execute("INSERT INTO bets SELECT * FROM bets_unpartitioned")
+    op.execute("DROP TABLE bets_unpartitioned")
+
+
+def downgrade() -> None:
+    if not _is_partitioned():
+        return
+
+    op.execute("ALTER TABLE bets RENAME TO bets_partitioned")
+    op.execute("ALTER TABLE bets_partitioned RENAME CONSTRAINT bets_pkey TO bets_partitioned_pkey")
+    op.execute("DROP INDEX IF EXISTS ix_bets_event_id_status")
+    op.execute("DROP INDEX IF EXISTS ix_bets_created_at_id")
+    op.execute("ALTER SEQUENCE bets_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE bets (
+            id integer PRIMARY KEY DEFAULT nextval('bets_id_seq'),
+            event_id varchar NOT NULL,
+            amount double precision NOT NULL,
+            status betstatus NOT NULL,
+            created_at timestamp without time zone NOT NULL,
+            coefficient double precision
+        )
+    """)
+    op.execute("ALTER SEQUENCE bets_id_seq OWNED BY bets.id")
+    op.execute("INSERT INTO bets SELECT * FROM bets_partitioned")
+    op.execute("DROP TABLE bets_partitioned CASCADE")
+    op.execute("DROP FUNCTION IF EXISTS bets_ensure_partitions(date, date)")
+    op.execute("CREATE INDEX ix_bets_event_id_status ON bets (event_id, status)")
+    op.execute("CREATE INDEX ix_bets_created_at_id ON bets (created_at, id)")
@@ -0,0 +1,42 @@
+"""create hourly bet rollups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2024-11-10 12:30:00
+
+Почасовые агрегаты ставок по событию и статусу. Заполняются воркером
+app.workers.rollups; для уже накопленных ставок выполните
+python -m app.workers.rollups --backfill.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bet_rollups_hourly",
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("event_id", sa.String(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM("PENDING", "WON", "LOST", name="betstatus", create_type=False),
+            nullable=False
+        ),
+        sa.Column("bets", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column("payout", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("bucket", "event_id", "status"),
+    )
+    # Отчёт по событию: WHERE event_id = ... AND bucket BETWEEN ...
+    op.create_index("ix_bet_rollups_hourly_event_id_bucket", "bet_rollups_hourly", ["event_id", "bucket"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bet_rollups_hourly_event_id_bucket", table_name="bet_rollups_hourly")
+    op.drop_table("bet_rollups_hourly")
@@ -0,0 +1,43 @@
+"""create bets archive
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2024-11-10 12:40:00
+
+Холодное хранилище рассчитанных ставок. Ставки переносит воркер
+app.workers.archiver; таблица только пополняется, поэтому на ней нет
+индексов горячего пути, кроме первичного ключа и created_at для пересчёта
+агрегатов.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bets_archive",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("event_id", sa.String(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM("PENDING", "WON", "LOST", name="betstatus", create_type=False),
+            nullable=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("coefficient", sa.Float(), nullable=True),
+        sa.Column("archived_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_bets_archive_created_at", "bets_archive", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bets_archive_created_at", table_name="bets_archive")
+    op.drop_table("bets_archive")
@@ -0,0 +1,22 @@
+"""index bets archive by event
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2024-11-10 12:50:00
+
+Пересчёт счётчиков риска события читает и архив рассчитанных ставок.
+"""
+from alembic import op
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_bets_archive_event_id", "bets_archive", ["event_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_bets_archive_event_id", table_name="bets_archive")
@@ -0,0 +1,69 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.core.exceptions import RateLimitExceededError, ServiceOverloadedError
+from app.services.admission import ConcurrencyLimiter, RateLimiter, client_id
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_token_bucket(redis_storage):
+    limiter = RateLimiter(redis_storage, rate=1, burst=2)
+    client = f"test:{uuid.uuid4()}"
+
+    await limiter.check(client)
+    await limiter.check(client)
+    with pytest.raises(RateLimitExceededError) as error:
+        await limiter.check(client)
+    assert error.value.status_code == 429
+    assert int(error.value.headers["Retry-After"]) >= 1
+
+    # Ведро у каждого клиента своё
+    await limiter.check(f"test:{uuid.uuid4()}")
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_sheds_load():
+    limiter = ConcurrencyLimiter(limit=1, timeout=0.05)
+    await limiter.acquire()
+
+    with pytest.raises(ServiceOverloadedError) as error:
+        await limiter.acquire()
+    assert error.value.status_code == 503
+    assert error.value.headers["Retry-After"] == "1"
+
+    # Освободившееся место достаётся ожидающему запросу
+    waiter = asyncio.create_task(limiter.acquire())
+    limiter.release()
+    await asyncio.wait_for(waiter, timeout=1)
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limiter_keeps_permit_on_cancel_race():
+    limiter = ConcurrencyLimiter(limit=1, timeout=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    # Место передано ожидающему, но тот отменён раньше, чем успел его забрать
+    limiter.release()
+    waiter.cancel()
+    try:
+        await waiter
+        # wait_for успел вернуть место до отмены: запрос держит его и отпускает
+        limiter.release()
+    except asyncio.CancelledError:
+        pass
+
+    # Место не потеряно ни в одном из исходов
+    assert limiter.in_flight == 0
+    await asyncio.wait_for(limiter.acquire(), timeout=0.1)
+    assert limiter.in_flight == 1
+
+
+def test_client_id_hides_api_key():
+    assert client_id("secret", "10.0.0.1").startswith("key:")
+    assert "secret" not in client_id("secret", "10.0.0.1")
+    assert client_id(None, "10.0.0.1") == "ip:10.0.0.1"
@@ -1,11 +1,16 @@
+import asyncio
+import uuid
+
 import pytest
+from app.core.config import settings
 from app.models.common import StatusEnum
+from app.services.heartbeat import worker_id
 
 
 @pytest.mark.asyncio
 async def test_get_events_api(client, event_service, sample_events, redis_storage):
     # Подготавливаем данные
-    await redis_storage.cache_events_list({event.event_id: event for event in sample_events})
+    await redis_storage.cache_events_list([event.model_dump(mode="json") for event in sample_events])
 
     # Делаем запрос
     response = await client.get("/events")
@@ -65,3 +70,125 @@ async def test_get_bets_api(client, bet_service, sample_event, event_service, re
     data = response.json()
     assert data["status"] == StatusEnum.SUCCESS
     assert len(data["data"]["bets"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_create_bet_api_idempotency_key(client, sample_event, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    payload = {"event_id": sample_event.event_id, "amount": 100.0}
+
+    # Одновременные дубликаты и повтор после ответа получают одну и ту же ставку
+    responses = await asyncio.gather(*(client.post("/bet", json=payload, headers=headers) for _ in range(5)))
+    replay = await client.post("/bet", json=payload, headers=headers)
+
+    bet_ids = {response.json()["data"]["id"] for response in [*responses, replay]}
+    assert all(response.status_code == 200 for response in responses)
+    assert len(bet_ids) == 1
+
+    # Тот же ключ с другим телом запроса отклоняется
+    response = await client.post("/bet", json={**payload, "amount": 200.0}, headers=headers)
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_idempotency_key_is_scoped_per_client(client, sample_event, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    key = str(uuid.uuid4())
+    payload = {"event_id": sample_event.event_id, "amount": 100.0}
+
+    # Тот же ключ у разных клиентов не отдаёт чужую ставку
+    first = await client.post("/bet", json=payload, headers={"Idempotency-Key": key, "X-API-Key": "client-a"})
+    second = await client.post("/bet", json=payload, headers={"Idempotency-Key": key, "X-API-Key": "client-b"})
+    replay = await client.post("/bet", json=payload, headers={"Idempotency-Key": key, "X-API-Key": "client-a"})
+
+    assert first.status_code == second.status_code == replay.status_code == 200
+    assert first.json()["data"]["id"] != second.json()["data"]["id"]
+    assert replay.json()["data"]["id"] == first.json()["data"]["id"]
+
+
+@pytest.mark.asyncio
+async def test_create_bets_batch_api(client, sample_event, redis_storage):
+    await redis_storage.cache_event(sample_event)
+
+    response = await client.post(
+        "/bets/batch",
+        json={"bets": [
+            {"event_id": sample_event.event_id, "amount": 100.0},
+            {"event_id": "nonexistent", "amount": 100.0},
+        ]}
+    )
+
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["created"] == 1
+    assert data["failed"] == 1
+    assert data["results"][1]["status"] == StatusEnum.ERROR
+
+
+@pytest.mark.asyncio
+async def test_metrics_api(client, event_service, sample_events, redis_storage):
+    await redis_storage.cache_events_list([event.model_dump(mode="json") for event in sample_events])
+    await client.get("/events")
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert 'method="GET",route="/events",status="200"}' in response.text
+    assert f'http_request_duration_seconds_count{{worker="{worker_id()}",' in response.text
+    assert "event_cache_requests_total" in response.text
+
+
+@pytest.mark.asyncio
+async def test_workers_health_api(client):
+    response = await client.get("/health/workers")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["count"] >= 1
+    assert all("worker_id" in worker for worker in data["workers"])
+
+
+@pytest.mark.asyncio
+async def test_ready_api(client):
+    # Прогрев идёт в фоне, до его завершения /ready отвечает 503
+    for _ in range(100):
+        response = await client.get("/ready")
+        if response.status_code == 200:
+            break
+        assert response.status_code == 503
+        await asyncio.sleep(0.1)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["ready"] is True
+    assert data["warmup"]["done"] is True
+    assert data["database"]["ok"] and data["redis"]["ok"]
+    assert data["database"]["latency_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_get_bet_api(client, sample_event, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    created = await client.post("/bet", json={"event_id": sample_event.event_id, "amount": 100.0})
+    bet_id = created.json()["data"]["id"]
+
+    response = await client.get(f"/bets/{bet_id}")
+    assert response.status_code == 200
+    assert response.json()["data"]["id"] == bet_id
+
+    response = await client.get("/bets/999999999")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_event_changes_require_webhook_token(client, monkeypatch):
+    changes = [{"event_id": "event1", "coefficient": 100.0}]
+
+    # Без настроенного токена приём изменений закрыт
+    monkeypatch.setattr(settings, "LINE_PROVIDER_WEBHOOK_TOKEN", None)
+    response = await client.post("/events/changes", json=changes)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "LINE_PROVIDER_WEBHOOK_TOKEN", "secret")
+    response = await client.post("/events/changes", json=changes, headers={"X-Webhook-Token": "wrong"})
+    assert response.status_code == 403
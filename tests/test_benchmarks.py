@@ -0,0 +1,47 @@
+import httpx
+import pytest
+
+from benchmarks.fake_line_provider import create_app
+from benchmarks.load import percentile, summarize
+from benchmarks.settlement import format_table
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 99) == 0.0
+
+
+def test_summarize_counts_errors():
+    result = summarize([0.2, 0.1], {"200": 1, "503": 1}, 1.0)
+    assert result["requests"] == 2
+    assert result["errors"] == 1
+    assert result["latency_ms"]["p50"] == 100.0
+
+
+def test_settlement_table_orders_rows():
+    table = format_table([
+        {"path": "batched", "rows": 10000, "seconds": 0.1, "rows_per_second": 100000, "peak_memory_mb": 1.0},
+        {"path": "legacy", "rows": 10000, "seconds": 1.0, "rows_per_second": 10000, "peak_memory_mb": 9.0},
+    ])
+    rows = table.splitlines()[2:]
+    assert rows == [
+        "| 10,000 | legacy | 1.0 | 10,000 | 9.0 |",
+        "| 10,000 | batched | 0.1 | 100,000 | 1.0 |",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_fake_line_provider():
+    app = create_app(events=3, error_rate=0.0)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake") as client:
+        response = await client.get("/events")
+        assert len(response.json()["data"]["events"]) == 3
+        assert (await client.get("/events/event_0")).json()["data"]["event_id"] == "event_0"
+        assert (await client.get("/events/unknown")).status_code == 404
+
+    app = create_app(events=3, error_rate=1.0)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake") as client:
+        assert (await client.get("/events")).status_code == 503
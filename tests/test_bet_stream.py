@@ -0,0 +1,32 @@
+from app.services.bet_stream import BetStatusBroadcaster
+
+
+def test_dispatch_filters_by_bet_and_event():
+    broadcaster = BetStatusBroadcaster(None)
+    by_bet = broadcaster.subscribe(bet_ids=[1, 3])
+    by_event = broadcaster.subscribe(event_ids=["event1"])
+    other = broadcaster.subscribe(bet_ids=[42])
+
+    broadcaster.dispatch({"event_id": "event1", "status": "won", "bet_ids": [1, 2, 3]})
+
+    assert by_bet.queue.get_nowait()["bet_ids"] == [1, 3]
+    assert by_event.queue.get_nowait()["bet_ids"] == [1, 2, 3]
+    assert other.queue.empty()
+
+    for subscription in (by_bet, by_event, other):
+        broadcaster.unsubscribe(subscription)
+    assert len(broadcaster) == 0
+
+
+def test_slow_subscriber_overflows():
+    broadcaster = BetStatusBroadcaster(None, queue_size=2)
+    subscription = broadcaster.subscribe()
+
+    for bet_id in range(5):
+        broadcaster.dispatch({"event_id": "event1", "status": "lost", "bet_ids": [bet_id]})
+
+    # Буфер не растёт сверх предела, последним читатель получает признак переполнения
+    assert subscription.overflowed
+    assert subscription.queue.qsize() == 2
+    subscription.queue.get_nowait()
+    assert subscription.queue.get_nowait() is None
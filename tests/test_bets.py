@@ -1,12 +1,31 @@
+import asyncio
+from unittest.mock import AsyncMock, patch
+
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from fastapi.responses import ORJSONResponse
 
-from app.models.bets import BetStatus
+from app.models.bets import BetRecord, BetStatus
 from app.models.events import EventStatus
+from app.core.config import settings
+from app.services.archive import BetArchiver
+from app.services.bets import BetService
+from app.services.exposure import ExposureService
+from app.services.partitions import PartitionMaintainer
+from app.storage.memory import event_cache
+from app.storage.group_commit import BetWriter
+from app.workers.settlement import SettlementWorker
+from app.schemas.bets import BetResponse
 from app.core.exceptions import (
     BetValidationError,
     EventNotFoundError,
-    DeadlinePassedError
+    DeadlinePassedError,
+    ExposureLimitError,
+    LineProviderError
 )
 
 
@@ -57,11 +76,50 @@ async def test_get_bets(bet_service, sample_event, event_service, redis_storage)
     bet2 = await bet_service.create_bet(sample_event.event_id, 200.0)
 
     # Получаем все ставки
-    bets = await bet_service.get_bets()
+    bets, next_cursor = await bet_service.get_bets()
 
     assert len(bets) == 2
     assert any(b.id == bet1.id for b in bets)
     assert any(b.id == bet2.id for b in bets)
+    assert next_cursor is None
+
+
+@pytest.mark.asyncio
+async def test_get_bets_pagination(bet_service, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    created = [await bet_service.create_bet(sample_event.event_id, 100.0) for _ in range(5)]
+
+    # Проходим все страницы по курсору
+    seen = []
+    cursor = None
+    while True:
+        bets, cursor = await bet_service.get_bets(limit=2, cursor=cursor, event_id=sample_event.event_id)
+        seen.extend(bet.id for bet in bets)
+        if cursor is None:
+            break
+
+    assert seen == sorted((bet.id for bet in created), reverse=True)
+
+
+@pytest.mark.asyncio
+async def test_get_bets_timezone_aware_range(bet_service, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    bet = await bet_service.create_bet(sample_event.event_id, 100.0)
+
+    # Границы с часовым поясом сравниваются с локальным created_at ставки
+    moment = bet.created_at.astimezone(timezone(timedelta(hours=5)))
+    bets, _ = await bet_service.get_bets(
+        event_id=sample_event.event_id,
+        created_from=moment - timedelta(seconds=1),
+        created_to=moment + timedelta(seconds=1)
+    )
+    assert [found.id for found in bets] == [bet.id]
+
+
+@pytest.mark.asyncio
+async def test_get_bets_invalid_cursor(bet_service):
+    with pytest.raises(BetValidationError):
+        await bet_service.get_bets(cursor="not-a-cursor")
 
 
 @pytest.mark.asyncio
@@ -71,13 +129,14 @@ async def test_update_bet_status(bet_service, sample_event, event_service, redis
     bet = await bet_service.create_bet(sample_event.event_id, 100.0)
 
     # Обновляем статус события
-    updated_bets = await bet_service.update_bet_status(
+    settled = await bet_service.update_bet_status(
         sample_event.event_id,
         EventStatus.FIRST_TEAM_WON
     )
 
-    assert len(updated_bets) == 1
-    assert updated_bets[0].status == BetStatus.WON
+    assert settled == 1
+    updated_bet = await bet_service.get_bet(bet.id)
+    assert updated_bet.status == BetStatus.WON
 
 
 @pytest.mark.asyncio
@@ -87,10 +146,308 @@ async def test_update_bet_status_loss(bet_service, sample_event, event_service,
     bet = await bet_service.create_bet(sample_event.event_id, 100.0)
 
     # Обновляем статус события
-    updated_bets = await bet_service.update_bet_status(
+    settled = await bet_service.update_bet_status(
         sample_event.event_id,
         EventStatus.SECOND_TEAM_WON
     )
 
-    assert len(updated_bets) == 1
-    assert updated_bets[0].status == BetStatus.LOST
+    assert settled == 1
+    updated_bet = await bet_service.get_bet(bet.id)
+    assert updated_bet.status == BetStatus.LOST
+
+
+@pytest.mark.asyncio
+async def test_update_bet_status_is_restartable(bet_service, sample_event, event_service, redis_storage, monkeypatch):
+    monkeypatch.setattr(settings, "SETTLEMENT_BATCH_SIZE", 2)
+    await redis_storage.cache_event(sample_event)
+    for _ in range(5):
+        await bet_service.create_bet(sample_event.event_id, 100.0)
+
+    # Все ставки рассчитываются несколькими пачками
+    settled = await bet_service.update_bet_status(
+        sample_event.event_id,
+        EventStatus.FIRST_TEAM_WON
+    )
+    assert settled == 5
+
+    # Повторный запуск не трогает уже рассчитанные ставки
+    settled_again = await bet_service.update_bet_status(
+        sample_event.event_id,
+        EventStatus.SECOND_TEAM_WON
+    )
+    assert settled_again == 0
+
+
+@pytest.mark.asyncio
+async def test_create_bets_batch_partial_failure(bet_service, sample_event, expired_event, event_service, redis_storage):
+    await redis_storage.cache_events([sample_event, expired_event])
+
+    results = await bet_service.create_bets([
+        (sample_event.event_id, 100.0),
+        (expired_event.event_id, 100.0),
+        (sample_event.event_id, -1.0),
+        (sample_event.event_id, 200.0),
+    ])
+
+    assert results[0].amount == 100.0
+    assert isinstance(results[1], DeadlinePassedError)
+    assert isinstance(results[2], BetValidationError)
+    assert results[3].amount == 200.0
+    assert results[0].id != results[3].id
+
+
+@pytest.mark.asyncio
+async def test_create_bets_batch_line_provider_failure_is_per_position(bet_service, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    event_cache.clear()
+
+    # Событие без кэша и без последней известной версии не загружается
+    with patch.object(event_service, "fetch_event", side_effect=LineProviderError("HTTP 503")):
+        results = await bet_service.create_bets([
+            (sample_event.event_id, 100.0),
+            ("event_unavailable", 100.0),
+        ])
+
+    assert results[0].amount == 100.0
+    assert isinstance(results[1], LineProviderError)
+
+
+@pytest.mark.asyncio
+async def test_create_bet_group_commit(db_engine, db_session, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    writer = BetWriter(
+        session_factory=async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False),
+        window=0.01
+    )
+    await writer.start()
+    service = BetService(db_session, event_service, writer)
+
+    # Одновременные ставки записываются пачкой, каждая получает свой id
+    bets = await asyncio.gather(*(service.create_bet(sample_event.event_id, 100.0 + i) for i in range(20)))
+    await writer.stop()
+
+    assert len({bet.id for bet in bets}) == 20
+    assert [bet.amount for bet in bets] == [100.0 + i for i in range(20)]
+
+
+@pytest.mark.asyncio
+async def test_group_commit_fails_batch_on_connection_error():
+    writer = BetWriter(window=0.01)
+    calls = []
+
+    async def insert(values):
+        calls.append(len(values))
+        raise OperationalError("INSERT", {}, ConnectionError("connection lost"))
+
+    writer._insert = insert
+    await writer.start()
+    results = await asyncio.gather(*(writer.insert({"amount": i}) for i in range(5)), return_exceptions=True)
+    await writer.stop()
+
+    # Пачка не повторяется построчно: одна попытка, ошибка у всех
+    assert calls == [5]
+    assert all(isinstance(result, OperationalError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_bet_keeps_reservation_until_write_result(sample_event):
+    event_service = AsyncMock()
+    event_service.get_event.return_value = sample_event.model_copy(update={"event_id": "cancelled_bet_event"})
+    exposure = AsyncMock()
+    exposure.reserve.return_value = [True]
+    writer = BetWriter()
+    service = BetService(None, event_service, writer, exposure)
+
+    for outcome, released in ((None, False), (OperationalError("INSERT", {}, ConnectionError()), True)):
+        exposure.release.reset_mock()
+        task = asyncio.create_task(service.create_bet("cancelled_bet_event", 100.0))
+        while writer._queue.empty():
+            await asyncio.sleep(0)
+        _, future = writer._queue.get_nowait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        # Клиент ушёл, но судьба резерва решается результатом записи
+        exposure.release.assert_not_awaited()
+        if outcome is None:
+            future.set_result(None)
+        else:
+            future.set_exception(outcome)
+        for _ in range(3):
+            await asyncio.sleep(0)
+        assert exposure.release.await_count == int(released)
+
+
+@pytest.mark.asyncio
+async def test_partition_maintainer_runs_only_on_leader():
+    storage = AsyncMock()
+    maintainer = PartitionMaintainer(storage)
+    with patch("app.services.partitions.ensure_bets_partitions", AsyncMock()) as ensure:
+        storage.acquire_leadership.return_value = False
+        assert not await maintainer.run_once()
+        ensure.assert_not_awaited()
+
+        storage.acquire_leadership.return_value = True
+        assert await maintainer.run_once()
+        ensure.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_settlement_worker_settles_outcome(bet_service, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    bet = await bet_service.create_bet(sample_event.event_id, 100.0)
+
+    worker = SettlementWorker(redis_storage.redis)
+    task = asyncio.create_task(worker.run())
+    await redis_storage.publish_event_outcome(sample_event.event_id, EventStatus.FIRST_TEAM_WON.value)
+
+    # Ждём, пока воркер рассчитает ставку
+    for _ in range(50):
+        settled_bet = await bet_service.get_bet(bet.id)
+        if settled_bet.status != BetStatus.PENDING:
+            break
+        await asyncio.sleep(0.1)
+    worker.stop()
+    await task
+
+    assert settled_bet.status == BetStatus.WON
+
+
+@pytest.mark.asyncio
+async def test_exposure_counters_and_limit(db_session, sample_event, event_service, redis_storage, monkeypatch):
+    await redis_storage.cache_event(sample_event)
+    exposure = ExposureService(redis_storage, db_session)
+    await redis_storage.redis.delete(f"{exposure.EXPOSURE_PREFIX}{sample_event.event_id}")
+    service = BetService(db_session, event_service, exposure=exposure)
+
+    # Лимит пропускает две ставки по 100 и отклоняет третью
+    monkeypatch.setattr(settings, "MAX_EVENT_EXPOSURE", 2.5 * 100 * sample_event.coefficient)
+    await service.create_bet(sample_event.event_id, 100.0)
+    await service.create_bet(sample_event.event_id, 100.0)
+    with pytest.raises(ExposureLimitError):
+        await service.create_bet(sample_event.event_id, 100.0)
+
+    data = await exposure.get_exposure(sample_event.event_id)
+    assert data.pending_bets == 2
+    assert data.pending_amount == pytest.approx(200.0)
+    assert data.pending_liability == pytest.approx(200.0 * sample_event.coefficient)
+
+    await service.update_bet_status(sample_event.event_id, EventStatus.FIRST_TEAM_WON)
+    data = await exposure.get_exposure(sample_event.event_id)
+    assert data.pending_bets == 0
+    assert data.pending_liability == pytest.approx(0.0)
+    assert data.turnover == pytest.approx(200.0)
+    assert data.payout == pytest.approx(200.0 * sample_event.coefficient)
+
+
+@pytest.mark.asyncio
+async def test_exposure_recovers_after_failed_settle(db_session, sample_event, event_service, redis_storage, monkeypatch):
+    await redis_storage.cache_event(sample_event)
+    exposure = ExposureService(redis_storage, db_session)
+    await redis_storage.redis.delete(f"{exposure.EXPOSURE_PREFIX}{sample_event.event_id}")
+    service = BetService(db_session, event_service, exposure=exposure)
+    await service.create_bet(sample_event.event_id, 100.0)
+
+    # Пачка зафиксирована, но Redis упал до обновления счётчиков
+    async def broken_settle(*args, **kwargs):
+        raise ConnectionError("redis is down")
+    monkeypatch.setattr(exposure, "settle", broken_settle)
+    with pytest.raises(ConnectionError):
+        await service.update_bet_status(sample_event.event_id, EventStatus.FIRST_TEAM_WON)
+    assert (await exposure.get_exposure(sample_event.event_id)).pending_bets > 0
+
+    # Повторный расчёт не находит ожидающих ставок, но выравнивает счётчики по базе
+    monkeypatch.undo()
+    assert await service.update_bet_status(sample_event.event_id, EventStatus.FIRST_TEAM_WON) == 0
+    data = await exposure.get_exposure(sample_event.event_id)
+    assert data.pending_bets == 0
+    assert data.pending_liability == pytest.approx(0.0)
+
+
+def test_bet_record_serialization():
+    record = BetRecord(1, "event1", 100.0, BetStatus.WON, datetime(2024, 1, 1, 12, 0), 1.85)
+
+    # Быстрый путь orjson и схема ответа дают одинаковое представление
+    fast = ORJSONResponse({"bet": record}).body
+    assert fast == (
+        b'{"bet":{"id":1,"event_id":"event1","amount":100.0,"status":"won",'
+        b'"created_at":"2024-01-01T12:00:00","coefficient":1.85}}'
+    )
+    assert BetResponse(status="success", data=record).model_dump(mode="json")["data"] == {
+        "id": 1,
+        "event_id": "event1",
+        "amount": 100.0,
+        "status": "won",
+        "created_at": "2024-01-01T12:00:00",
+        "coefficient": 1.85
+    }
+
+
+@pytest.mark.asyncio
+async def test_archive_settled_bets(db_engine, bet_service, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    settled = [await bet_service.create_bet(sample_event.event_id, 100.0 + i) for i in range(3)]
+    await bet_service.update_bet_status(sample_event.event_id, EventStatus.FIRST_TEAM_WON)
+    pending = await bet_service.create_bet(sample_event.event_id, 50.0)
+
+    archiver = BetArchiver(
+        session_factory=async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False),
+        batch_size=2,
+        pause=0
+    )
+    # Пачки по 2 ставки: проход переносит все рассчитанные, ожидающие остаются
+    assert await archiver.archive(timedelta(0)) >= len(settled)
+    assert await archiver.archive(timedelta(0)) == 0
+
+    bets, _ = await bet_service.get_bets(event_id=sample_event.event_id)
+    hot_ids = {bet.id for bet in bets}
+    assert pending.id in hot_ids
+    assert not hot_ids & {bet.id for bet in settled}
+
+    # Поиск по ID прозрачно находит ставку в архиве
+    archived = await bet_service.get_bet(settled[0].id)
+    assert archived.status == BetStatus.WON
+    assert archived.amount == settled[0].amount
+
+
+@pytest.mark.asyncio
+async def test_settlement_worker_survives_redis_errors():
+    redis = AsyncMock()
+    redis.xautoclaim.return_value = ("0-0", [], [])
+    worker = SettlementWorker(redis)
+    worker.MIN_BACKOFF = 0.01
+
+    # Две ошибки Redis подряд, затем пустой ответ и остановка
+    def read_new(*args, **kwargs):
+        if redis.xreadgroup.await_count < 3:
+            raise RedisConnectionError("connection refused")
+        worker.stop()
+        return None
+    redis.xreadgroup.side_effect = read_new
+
+    await asyncio.wait_for(worker.run(), timeout=5)
+    assert redis.xreadgroup.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_exposure_rebuild_includes_archive(db_engine, db_session, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    exposure = ExposureService(redis_storage, db_session)
+    service = BetService(db_session, event_service, exposure=exposure)
+    await service.create_bet(sample_event.event_id, 100.0)
+    await service.update_bet_status(sample_event.event_id, EventStatus.FIRST_TEAM_WON)
+    before = await exposure.get_exposure(sample_event.event_id)
+
+    archiver = BetArchiver(
+        session_factory=async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False),
+        pause=0
+    )
+    assert await archiver.archive(timedelta(0)) > 0
+
+    # Счётчики, собранные заново после архивации, не теряют рассчитанные ставки
+    await exposure.rebuild(sample_event.event_id, force=True)
+    after = await exposure.get_exposure(sample_event.event_id)
+    assert after.bets == before.bets
+    assert after.turnover == pytest.approx(before.turnover)
+    assert after.payout == pytest.approx(before.payout)
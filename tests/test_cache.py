@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.storage.memory import CacheStats, SingleFlight, TTLCache
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("fresh", 1)
+    cache.set("expired", 2, ttl=0)
+
+    assert cache.get("fresh") == 1
+    assert cache.get("expired") is None
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_loads():
+    stats = CacheStats()
+    flight = SingleFlight(stats)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return "event"
+
+    results = await asyncio.gather(*(flight.do("key", loader) for _ in range(500)))
+
+    assert calls == 1
+    assert stats.stampedes == 499
+    assert set(results) == {"event"}
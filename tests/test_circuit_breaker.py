@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError, CircuitState
+
+
+async def failing():
+    raise ConnectionError("line provider is down")
+
+
+async def succeeding():
+    return "ok"
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=60)
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            await breaker.call(failing)
+
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(succeeding)
+
+
+@pytest.mark.asyncio
+async def test_circuit_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    # Неудачная проба снова размыкает цепь, удачная замыкает
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+    assert await breaker.call(succeeding) == "ok"
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_circuit_cancelled_probe_releases_slot():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    with pytest.raises(ConnectionError):
+        await breaker.call(failing)
+
+    # Пробный запрос отменён вызывающим, не успев завершиться
+    probe = asyncio.create_task(breaker.call(lambda: asyncio.sleep(10)))
+    await asyncio.sleep(0)
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert await breaker.call(succeeding) == "ok"
+    assert breaker.state == CircuitState.CLOSED
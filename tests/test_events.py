@@ -1,22 +1,29 @@
 import pytest
-from unittest.mock import patch
-from httpx import Response
+from unittest.mock import AsyncMock, patch
+from httpx import ConnectError, Response
 import json
+import time
 
-from app.models.events import EventStatus
+from app.core.config import settings
+from app.models.events import EventChange, EventStatus
 from app.models.common import StatusEnum
-from app.core.exceptions import LineProviderError
+from app.core.exceptions import DeadlinePassedError, LineProviderError
+from app.services import invalidation
+from app.services.event_poller import EventPoller
+from app.services.invalidation import EventChangeService, apply_event_change
+from app.storage.memory import event_cache
+from app.storage.snapshots import EventSnapshot, EventSnapshotStore
 
 
 @pytest.mark.asyncio
 async def test_get_events_from_cache(event_service, sample_events, redis_storage):
     # Кэшируем события
-    await redis_storage.cache_events_list({event.event_id: event for event in sample_events})
+    await redis_storage.cache_events_list([event.model_dump(mode="json") for event in sample_events])
 
     # Получаем события
     events = await event_service.get_events()
     assert len(events) == len(sample_events)
-    assert all(event.event_id in events for event in sample_events)
+    assert {event.event_id for event in events} == {event.event_id for event in sample_events}
 
 
 @pytest.mark.asyncio
@@ -34,7 +41,7 @@ async def test_get_events_from_line_provider(event_service, sample_events):
         events = await event_service.get_events()
 
         assert len(events) == len(sample_events)
-        assert all(event.event_id in events for event in sample_events)
+        assert {event.event_id for event in events} == {event.event_id for event in sample_events}
 
 
 @pytest.mark.asyncio
@@ -63,3 +70,172 @@ async def test_get_nonexistent_event(event_service):
         mock_get.return_value = Response(404)
         event = await event_service.get_event("nonexistent")
         assert event is None
+
+
+@pytest.mark.asyncio
+async def test_cache_and_get_events_batch(redis_storage, sample_events):
+    await redis_storage.cache_events(sample_events)
+
+    cached = await redis_storage.get_cached_events([event.event_id for event in sample_events] + ["missing"])
+    assert set(cached) == {event.event_id for event in sample_events}
+
+
+@pytest.mark.asyncio
+async def test_get_events_by_ids_from_cache(event_service, sample_events, redis_storage):
+    await redis_storage.cache_events(sample_events)
+
+    with patch('httpx.AsyncClient.get') as mock_get:
+        events, failed = await event_service.get_events_by_ids([event.event_id for event in sample_events])
+        mock_get.assert_not_called()
+
+    assert set(events) == {event.event_id for event in sample_events}
+    assert failed == {}
+
+
+@pytest.mark.asyncio
+async def test_get_event_serves_stale_when_line_provider_down(event_service, sample_event, redis_storage):
+    # Свежая запись истекла, осталась только долгоживущая копия
+    await redis_storage.cache_event(sample_event)
+    await redis_storage.redis.delete(f"{redis_storage.EVENT_PREFIX}{sample_event.event_id}")
+    event_cache.clear()
+
+    with patch('httpx.AsyncClient.get') as mock_get:
+        mock_get.side_effect = ConnectError("Connection error")
+        event = await event_service.get_event(sample_event.event_id)
+
+    assert event is not None
+    assert event.event_id == sample_event.event_id
+
+
+def test_snapshot_store_diff(sample_events):
+    store = EventSnapshotStore(max_age=60)
+    first, second = sample_events
+
+    store.replace(EventSnapshot.build(1, [first, second], fetched_at=0))
+    changed = first.model_copy(update={"coefficient": first.coefficient + 1})
+    diff = store.replace(EventSnapshot.build(2, [changed], fetched_at=0))
+
+    assert diff.changed == (first.event_id,)
+    assert diff.removed == (second.event_id,)
+    assert diff.added == ()
+    assert store.snapshot.events[first.event_id].coefficient == changed.coefficient
+
+    # Снимок с меньшей версией не заменяет текущий
+    assert not store.replace(EventSnapshot.build(1, [first, second], fetched_at=0))
+    assert store.snapshot.version == 2
+
+
+def test_open_events_index(sample_event, expired_event):
+    store = EventSnapshotStore(max_age=60)
+    later = sample_event.model_copy(update={"event_id": "later", "deadline": "2999-01-01T00:00:00"})
+    store.replace(EventSnapshot.build(1, [later, sample_event, expired_event], fetched_at=time.time()))
+
+    assert store.get_open_event(sample_event.event_id) == sample_event
+    assert [event.event_id for event in store.open_events.open_events()] == [sample_event.event_id, "later"]
+    with pytest.raises(DeadlinePassedError):
+        store.get_open_event(expired_event.event_id)
+    # Событие могло появиться у line provider после опроса: решает обычный путь
+    assert store.get_open_event("unknown") is None
+
+    # Событие закрывается, когда наступает его дедлайн
+    store.open_events.evict(now=time.time() + 2 * 24 * 3600)
+    with pytest.raises(DeadlinePassedError):
+        store.get_open_event(sample_event.event_id)
+    assert [event.event_id for event in store.open_events.open_events()] == ["later"]
+
+
+def test_open_events_index_requires_fresh_snapshot(sample_event):
+    store = EventSnapshotStore(max_age=60)
+    store.replace(EventSnapshot.build(1, [sample_event], fetched_at=time.time() - 120))
+
+    # По устаревшему снимку решение не принимается
+    assert store.get_open_event("unknown") is None
+
+
+@pytest.mark.asyncio
+async def test_event_change_updates_caches(event_service, sample_event, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    await event_service.get_event(sample_event.event_id)
+
+    await EventChangeService(redis_storage).apply_changes([
+        EventChange(event_id=sample_event.event_id, coefficient=3.5, status=EventStatus.FIRST_TEAM_WON)
+    ])
+
+    cached = await redis_storage.get_cached_event(sample_event.event_id)
+    event = await event_service.get_event(sample_event.event_id)
+    assert cached.coefficient == event.coefficient == 3.5
+    assert event.status == EventStatus.FIRST_TEAM_WON
+    assert event.deadline == sample_event.deadline
+
+
+@pytest.mark.asyncio
+async def test_event_change_unknown_event_invalidates(event_service, sample_event, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    event_cache.clear()
+
+    # Изменение без полных данных о событии сбрасывает его из кэша
+    await EventChangeService(redis_storage).apply_changes([EventChange(event_id="unknown", coefficient=2.0)])
+
+    assert await redis_storage.get_cached_event("unknown") is None
+
+
+def test_event_change_without_payload_keeps_snapshot_event(sample_event, monkeypatch):
+    store = EventSnapshotStore(max_age=60)
+    store.replace(EventSnapshot.build(1, [sample_event], fetched_at=time.time()))
+    monkeypatch.setattr(invalidation, "event_snapshots", store)
+
+    # Изменение одного коэффициента не должно убирать событие из снимка
+    apply_event_change({"change": {"event_id": sample_event.event_id, "coefficient": 2.5}})
+
+    event = store.get_open_event(sample_event.event_id)
+    assert event.coefficient == 2.5
+    assert event.deadline == sample_event.deadline
+
+
+@pytest.mark.asyncio
+async def test_untrusted_outcome_requires_line_provider_confirmation(event_service, sample_event, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    service = EventChangeService(redis_storage, event_service)
+    stream_length = await redis_storage.redis.xlen(settings.SETTLEMENT_STREAM)
+
+    # Line provider считает событие незавершённым: исход на расчёт не уходит
+    with patch.object(event_service, "fetch_event", return_value=sample_event):
+        await service.apply_changes([EventChange(event_id=sample_event.event_id, status=EventStatus.FIRST_TEAM_WON)])
+    assert await redis_storage.redis.xlen(settings.SETTLEMENT_STREAM) == stream_length
+
+    finished = sample_event.model_copy(update={"status": EventStatus.FIRST_TEAM_WON})
+    with patch.object(event_service, "fetch_event", return_value=finished):
+        await service.apply_changes([EventChange(event_id=sample_event.event_id, status=EventStatus.FIRST_TEAM_WON)])
+    assert await redis_storage.redis.xlen(settings.SETTLEMENT_STREAM) == stream_length + 1
+
+
+def test_open_events_index_skips_unparseable_deadline(sample_event):
+    store = EventSnapshotStore(max_age=60)
+    broken = sample_event.model_copy(update={"event_id": "broken", "deadline": "soon"})
+    store.replace(EventSnapshot.build(1, [sample_event, broken], fetched_at=time.time()))
+
+    # Событие существует, поэтому не 404: проверка уходит в EventService
+    assert store.get_open_event("broken") is None
+    assert [event.event_id for event in store.open_events.open_events()] == [sample_event.event_id]
+
+
+@pytest.mark.asyncio
+async def test_new_poller_leader_publishes_only_new_outcomes(sample_event):
+    settled = sample_event.model_copy(update={"event_id": "settled", "status": EventStatus.FIRST_TEAM_WON})
+    finished = sample_event.model_copy(update={"status": EventStatus.SECOND_TEAM_WON})
+
+    storage = AsyncMock()
+    storage.acquire_leadership.return_value = True
+    storage.next_events_snapshot_version.return_value = 2
+    # Прежний ведущий уже опубликовал первое событие рассчитанным, второе — открытым
+    storage.get_events_snapshot.return_value = {
+        "version": 1,
+        "fetched_at": time.time(),
+        "events": [settled.model_dump(mode="json"), sample_event.model_dump(mode="json")],
+    }
+
+    poller = EventPoller(storage, AsyncMock(), store=EventSnapshotStore(max_age=60))
+    with patch.object(poller.event_service, "fetch_events", AsyncMock(return_value=[settled, finished])):
+        await poller.poll_once()
+
+    storage.publish_event_outcome.assert_awaited_once_with(finished.event_id, EventStatus.SECOND_TEAM_WON.value)
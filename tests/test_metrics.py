@@ -0,0 +1,39 @@
+from app.core.metrics import Counter, Gauge, Histogram, Registry, merge_families, render_families
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0)))
+
+    histogram.observe(0.05, ("/bet",))
+    histogram.observe(0.5, ("/bet",))
+    histogram.observe(5.0, ("/bet",))
+
+    output = registry.render()
+    assert 'latency_seconds_bucket{route="/bet",le="0.1"} 1' in output
+    assert 'latency_seconds_bucket{route="/bet",le="1.0"} 2' in output
+    assert 'latency_seconds_bucket{route="/bet",le="+Inf"} 3' in output
+    assert 'latency_seconds_count{route="/bet"} 3' in output
+
+
+def test_counter_labels():
+    registry = Registry()
+    counter = registry.register(Counter("errors_total", "Errors", ("reason",)))
+
+    counter.inc(labels=("timeout",))
+    counter.inc(2, labels=("timeout",))
+
+    assert 'errors_total{reason="timeout"} 3' in registry.render()
+
+
+def test_merge_families_keeps_one_header_per_family():
+    first, second = Registry(), Registry()
+    for registry in (first, second):
+        registry.register(Counter("errors_total", "Errors", ("reason",))).inc(labels=("timeout",))
+        registry.register(Gauge("connections", "Connections")).set(2)
+
+    output = render_families(merge_families([first.families("a:1"), second.families("b:2")]))
+    assert output.count("# TYPE errors_total counter") == 1
+    assert 'errors_total{worker="a:1",reason="timeout"} 1' in output
+    assert 'errors_total{worker="b:2",reason="timeout"} 1' in output
+    assert 'connections{worker="b:2"} 2' in output
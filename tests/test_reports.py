@@ -0,0 +1,62 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.exceptions import ReportRangeError
+from app.models.events import EventStatus
+from app.models.reports import ReportGranularity
+from app.services.bets import BetService
+from app.services.reports import ReportService
+from app.services.rollups import RollupAggregator, naive_local, parse_rollup_key, rollup_key
+
+
+def test_rollup_key_roundtrip():
+    # Идентификатор события может содержать двоеточие
+    hour, event_id = parse_rollup_key(rollup_key(datetime(2024, 11, 10, 12, 34, 56), "league:42"))
+    assert hour == datetime(2024, 11, 10, 12)
+    assert event_id == "league:42"
+
+
+def test_naive_local_converts_aware_moments():
+    moment = datetime(2024, 11, 10, 12, 0, tzinfo=timezone.utc)
+    local = naive_local(moment)
+    assert local.tzinfo is None
+    assert local == moment.astimezone().replace(tzinfo=None)
+    assert naive_local(datetime(2024, 11, 10, 12)) == datetime(2024, 11, 10, 12)
+    assert naive_local(None) is None
+
+
+@pytest.mark.asyncio
+async def test_report_range_is_bounded():
+    service = ReportService(session=None)
+    now = datetime.now()
+    with pytest.raises(ReportRangeError):
+        await service.get_report(ReportGranularity.HOUR, now, now - timedelta(hours=1))
+    with pytest.raises(ReportRangeError):
+        await service.get_report(ReportGranularity.HOUR, now - timedelta(days=365), now)
+
+
+@pytest.mark.asyncio
+async def test_rollups_follow_settlement(db_engine, db_session, sample_event, event_service, redis_storage):
+    await redis_storage.cache_event(sample_event)
+    service = BetService(db_session, event_service, storage=redis_storage)
+    for amount in (100.0, 50.0):
+        await service.create_bet(sample_event.event_id, amount)
+
+    aggregator = RollupAggregator(
+        redis_storage,
+        session_factory=async_sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
+    )
+    reports = ReportService(db_session)
+    await aggregator.run_once()
+    report = await reports.get_report(ReportGranularity.HOUR, datetime.now() - timedelta(hours=1), datetime.now(), sample_event.event_id)
+    assert report.total.bets == 2
+    assert report.total.pending_amount == 150.0
+
+    # Расчёт помечает часы ставок, следующий проход переносит их в выигравшие
+    await service.update_bet_status(sample_event.event_id, EventStatus.FIRST_TEAM_WON)
+    await aggregator.run_once()
+    report = await reports.get_report(ReportGranularity.DAY, datetime.now() - timedelta(days=1), datetime.now(), sample_event.event_id)
+    assert report.total.won_bets == 2
+    assert report.total.pending_bets == 0
+    assert report.total.payout == pytest.approx(150.0 * sample_event.coefficient)
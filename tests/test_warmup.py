@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services.warmup import Warmup
+
+
+@pytest.mark.asyncio
+async def test_warmup_retries_failed_steps(monkeypatch):
+    monkeypatch.setattr(settings, "WARMUP_RETRY_INTERVAL", 0.01)
+    warmup = Warmup(redis=None, client=None)
+    calls = {"database": 0, "redis": 0, "events": 0}
+
+    def step(name, failures):
+        async def run():
+            calls[name] += 1
+            if calls[name] <= failures:
+                raise ConnectionError(f"{name} is down")
+        return run
+
+    monkeypatch.setattr(warmup, "_warm_database", step("database", 0))
+    monkeypatch.setattr(warmup, "_warm_redis", step("redis", 2))
+    monkeypatch.setattr(warmup, "_warm_events", step("events", 1))
+
+    task = asyncio.create_task(warmup.run())
+    await asyncio.sleep(0)
+    # Пока шаг не прошёл, прогрев не завершён и ошибка видна в отчёте
+    assert not warmup.done
+    await asyncio.wait_for(task, timeout=1)
+
+    assert warmup.done
+    assert warmup.errors == {}
+    assert warmup.attempts == 3
+    # Успешные шаги не повторяются
+    assert calls == {"database": 1, "redis": 3, "events": 2}